@@ -0,0 +1,52 @@
+import sys
+import time
+
+import numpy as np
+
+from miniboss.memory.ann import (
+    EMBEDDING_DTYPES,
+    QuantizedRows,
+    normalize_rows,
+    quantize_rows,
+    top_k_indices,
+)
+
+
+def make_embeddings(count, dim, rng, clusters=1000):
+    # Embeddings of real texts are clustered by topic, which makes neighbours close
+    # in score and recall sensitive to rounding, so the rows are drawn around centres.
+    centres = normalize_rows(rng.standard_normal((clusters, dim)).astype(np.float32))
+    noise = normalize_rows(rng.standard_normal((count, dim)).astype(np.float32))
+    return normalize_rows(centres[rng.integers(0, clusters, count)] + 0.8 * noise)
+
+
+def benchmark_quantized_memory(count=100000, dim=1536, queries=100, k=10):
+    # Compare the recall@k, size and search time of each embedding storage type
+    # against exact float32 search, the way the local memory stores and scores them.
+    rng = np.random.default_rng(0)
+    vectors = make_embeddings(count, dim, rng)
+    picked = vectors[rng.integers(0, count, queries)]
+    noise = normalize_rows(rng.standard_normal((queries, dim)).astype(np.float32))
+    query_vectors = normalize_rows(picked + 0.5 * noise)
+
+    exact = top_k_indices(vectors, query_vectors, k)
+    print(f"{count} embeddings of {dim} dimensions, {queries} queries, k={k}")
+    print(f"{'type':>8} {'MB':>8} {'ms/query':>9} {f'recall@{k}':>10}")
+    for dtype in EMBEDDING_DTYPES:
+        rows, scales = quantize_rows(vectors, dtype)
+        matrix = rows if dtype == "float32" else QuantizedRows(rows, scales)
+        size = rows.nbytes + (0 if scales is None else scales.nbytes)
+
+        start = time.perf_counter()
+        found = [
+            top_k_indices(matrix, query[np.newaxis], k)[0] for query in query_vectors
+        ]
+        elapsed = (time.perf_counter() - start) / queries
+
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(exact, found)])
+        print(f"{dtype:>8} {size / 2**20:>8.1f} {elapsed * 1000:>9.2f} {recall:>10.3f}")
+
+
+# Run the benchmark.
+if __name__ == "__main__":
+    benchmark_quantized_memory(*map(int, sys.argv[1:2]))
@@ -1,9 +1,21 @@
 import os
-import subprocess
+import threading
+from pathlib import Path
 
 from colorama import Fore, Style
 
+from miniboss.agent.result_channel import (
+    ResultChannel,
+    can_read_shared_log,
+    install_result_channel_plugin,
+)
+from miniboss.agent.supervisor import ProcessCancelledError, ProcessSupervisor
 from miniboss.app import execute_command, get_command
+from miniboss.auto_gpt_logs import (
+    clean_task_complete_reason,
+    find_written_file,
+    get_log_offset,
+)
 from miniboss.config import Config
 from miniboss.json_utils.utilities import LLM_DEFAULT_RESPONSE_FORMAT, validate_json
 from miniboss.llm import create_chat_completion, create_chat_message
@@ -13,6 +25,9 @@ from miniboss.workspace import Jobspace
 
 CFG = Config()
 
+# Buddies running in parallel share one console
+CONSOLE_LOCK = threading.Lock()
+
 
 class Buddy:
     """Buddy class for interacting with Mini-Boss.
@@ -29,6 +44,10 @@ class Buddy:
         current_job (str): The current job assigned to the agent.
         workspace (object): The Jobspace object for workspace management.
         final_result (dict): The final result of the agent's interaction.
+        settings_file (str): The Buddy settings file passed to Auto-GPT.
+        result_channel (ResultChannel): The channel Auto-GPT reports its results through.
+        log_offset (int): The size of the Auto-GPT activity log when Auto-GPT was last launched.
+        supervisor (ProcessSupervisor): The supervisor of the Auto-GPT subprocess.
     """
 
     def __init__(
@@ -43,6 +62,7 @@ class Buddy:
         triggering_prompt,
         current_job,
         workspace_directory,
+        settings_file=None,
     ):
         """Initialize the Buddy class.
 
@@ -57,6 +77,8 @@ class Buddy:
             triggering_prompt (str): The prompt before the AI's response.
             current_job (str): The current job assigned to the agent.
             workspace_directory (str): The directory for the workspace.
+            settings_file (str, optional): The Buddy settings file passed to Auto-GPT.
+                Defaults to buddy_settings.yaml in the current working directory.
         """
         cfg = Config()
         self.ai_name = ai_name
@@ -70,6 +92,14 @@ class Buddy:
         self.current_job = current_job
         self.workspace = Jobspace(workspace_directory, cfg.restrict_to_workspace)
         self.final_result = {}
+        if settings_file is None:
+            settings_file = f"{os.getcwd()}/buddy_settings.yaml"
+        self.settings_file = str(Path(settings_file).resolve())
+        self.result_channel = ResultChannel.for_workspace(self.workspace.root)
+        self.log_offset = 0
+        self.supervisor = ProcessSupervisor(
+            ai_name, CFG.buddy_timeout, CFG.buddy_idle_timeout
+        )
 
     def start_interaction_loop(self):
         """Start the interaction loop of the agent."""
@@ -117,7 +147,7 @@ class Buddy:
                 logger.log_markdown(markdown_text)
 
                 target_directory = f"{os.getcwd()}/auto-gpt"
-                buddy_settings = f"{os.getcwd()}/buddy_settings.yaml"
+                buddy_settings = self.settings_file
                 command = [
                     "python3",
                     "-m",
@@ -158,23 +188,23 @@ class Buddy:
                 if CFG.install_plugin_deps:
                     command.append("--install-plugin-deps")
 
+                # Only read what this run of Auto-GPT reports
+                install_result_channel_plugin(target_directory)
+                self.result_channel.reset()
+                self.log_offset = get_log_offset(target_directory)
                 ##############################################
                 # to test completetion loop disable this block
                 # Launch Auto-GPT
-                process = subprocess.run(
+                # Auto-GPT only needs the console when it asks for input
+                process = self.supervisor.run(
                     command,
-                    encoding="utf8",
-                    stdout=None,
-                    stderr=None,
                     cwd=target_directory,
+                    env=self.result_channel.environment(),
+                    stream_output=CFG.continuous_mode,
                 )
-                # Check the return code to see if the command was successful
-                # if process.returncode == 0:
-                #     print("Buddy completed work successfully.")
-                # else:
-                #     print("Buddy work failed.")
-                #
-                reason = parse_auto_gpt_logs(target_directory)
+                if process.cancelled:
+                    raise ProcessCancelledError(f"{self.ai_name} was cancelled")
+                reason = self.get_task_complete_reason(target_directory)
                 ##############################################
                 # reason = 'Successfully retrieved Googles stock prices for yesterday and saved them in a format that can be easily analyzed.'
                 ##############################################
@@ -241,6 +271,48 @@ class Buddy:
             if self.log_result(result, command_name, self_feedback_resp, reason):
                 break
 
+    def cancel(self):
+        """Stop the Auto-GPT subprocess of the agent. Safe to call from any thread."""
+        self.supervisor.cancel()
+
+    def get_task_complete_reason(self, target_directory):
+        """Get the reason Auto-GPT gave for completing its task.
+
+        The result channel is read first. Auto-GPT builds that do not load the
+        result channel plugin fall back to the activity log written since the last
+        launch, but only when Buddies run one at a time.
+
+        Args:
+            target_directory (str): The Auto-GPT directory.
+
+        Returns:
+            str: The reason for task completion, or an empty string if not found.
+        """
+        arguments = self.result_channel.last_command_arguments("task_complete")
+        if arguments is not None:
+            return clean_task_complete_reason(str(arguments.get("reason", "")))
+        if not can_read_shared_log(CFG.max_workers):
+            logger.warn(
+                f"{self.ai_name}: Auto-GPT did not report task_complete through"
+                f" {self.result_channel.path}, and the shared activity log cannot be"
+                " read while Buddies run in parallel"
+            )
+            return ""
+        return parse_auto_gpt_logs(target_directory, self.log_offset)
+
+    def get_written_file(self):
+        """Get the last file Auto-GPT wrote during this Buddy's run.
+
+        Returns:
+            Tuple[str, str]: The file name and text, or empty strings if not found.
+        """
+        arguments = self.result_channel.last_command_arguments("write_to_file")
+        if arguments is not None:
+            return arguments.get("filename", ""), arguments.get("text", "")
+        if not can_read_shared_log(CFG.max_workers):
+            return "", ""
+        return find_written_file(f"{os.getcwd()}/auto-gpt", self.log_offset)
+
     def _resolve_pathlike_command_args(self, command_args):
         """Resolve path-like command arguments to actual paths.
 
@@ -341,10 +413,13 @@ class Buddy:
             str: The console input.
         """
         console_input = ""
-        if cfg.chat_messages_enabled:
-            console_input = clean_input("Waiting for your response...")
-        else:
-            console_input = clean_input(Fore.MAGENTA + "Input:" + Style.RESET_ALL)
+        with CONSOLE_LOCK:
+            if cfg.chat_messages_enabled:
+                console_input = clean_input("Waiting for your response...")
+            else:
+                console_input = clean_input(
+                    f"{self.ai_name} " + Fore.MAGENTA + "Input:" + Style.RESET_ALL
+                )
         return console_input.lower().strip()
 
     def process_console_input(self, console_input, cfg, assistant_reply_json):
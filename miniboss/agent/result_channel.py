@@ -0,0 +1,197 @@
+"""A JSON-lines channel that Auto-GPT reports a Buddy's results through."""
+from __future__ import annotations
+
+import io
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+from typing import List, Optional
+
+from miniboss.models import base_open_ai_plugin, result_channel_plugin
+from miniboss.models.result_channel_plugin import (
+    RESULT_FILE_ENV,
+    ResultChannelPlugin,
+    write_result_record,
+)
+
+RESULT_FILE_NAME = "auto_gpt_results.jsonl"
+
+# The plugin zip installed in Auto-GPT's plugins directory, and the package in it
+PLUGIN_ZIP_NAME = "miniboss_result_channel.zip"
+PLUGIN_PACKAGE = "miniboss_result_channel"
+
+_install_lock = threading.Lock()
+
+
+def build_plugin_zip() -> bytes:
+    """Return a zip of the result channel plugin that Auto-GPT can load.
+
+    The zip holds a package with the plugin module and its base class, so Auto-GPT
+    does not need Mini-Boss on its path to load it.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as plugin_zip:
+        for module in (base_open_ai_plugin, result_channel_plugin):
+            name = Path(module.__file__).name
+            plugin_zip.writestr(
+                f"{PLUGIN_PACKAGE}/{name}", Path(module.__file__).read_bytes()
+            )
+        plugin_zip.writestr(
+            f"{PLUGIN_PACKAGE}/__init__.py",
+            "from .result_channel_plugin import ResultChannelPlugin\n",
+        )
+    return buffer.getvalue()
+
+
+def install_result_channel_plugin(auto_gpt_directory: str | Path) -> Path:
+    """Install the result channel plugin in Auto-GPT's plugins directory, unless
+    the same plugin is already there.
+
+    Args:
+        auto_gpt_directory (str | Path): The directory Auto-GPT runs in.
+
+    Returns:
+        Path: The path of the plugin zip.
+    """
+    plugins_directory = Path(auto_gpt_directory) / os.getenv("PLUGINS_DIR", "plugins")
+    path = plugins_directory / PLUGIN_ZIP_NAME
+    data = build_plugin_zip()
+    with _install_lock:
+        try:
+            if path.read_bytes() == data:
+                return path
+        except OSError:
+            pass
+        plugins_directory.mkdir(parents=True, exist_ok=True)
+        # Written next to the zip and renamed over it, so an Auto-GPT that is
+        # starting never loads half a zip
+        file_descriptor, temp_path = tempfile.mkstemp(
+            prefix=f".{PLUGIN_ZIP_NAME}.", dir=plugins_directory
+        )
+        with os.fdopen(file_descriptor, "wb") as plugin_file:
+            plugin_file.write(data)
+        os.replace(temp_path, path)
+    return path
+
+
+def can_read_shared_log(max_workers: int) -> bool:
+    """Return whether results missing from a channel may be read from Auto-GPT's
+    activity log instead.
+
+    Every Buddy's Auto-GPT writes the same log, so the last command in it only
+    belongs to the Buddy when one Buddy runs at a time.
+    """
+    return max_workers <= 1
+
+
+class ResultChannel:
+    """An append-only JSON-lines file of the commands a Buddy's Auto-GPT ran.
+
+    The Buddy owns one channel in its workspace and passes its path to Auto-GPT in
+    the MINIBOSS_RESULT_FILE environment variable. The ResultChannelPlugin, which
+    the Buddy installs in Auto-GPT, appends one record per command, e.g.
+    `{"command": "task_complete", "arguments": {"reason": "..."}}`, from its
+    pre_command hook. Every Buddy reads its own file, so parallel runs never see
+    each other's results.
+
+    Attributes:
+        path (Path): The path of the channel file.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """Initialize the ResultChannel.
+
+        Args:
+            path (str | Path): The path of the channel file.
+        """
+        self.path = Path(path)
+        self._records = []
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_workspace(cls, workspace_root: str | Path) -> ResultChannel:
+        """Return the channel kept in a Buddy workspace."""
+        return cls(Path(workspace_root) / RESULT_FILE_NAME)
+
+    @classmethod
+    def from_environment(cls) -> Optional[ResultChannel]:
+        """Return the channel the parent Buddy passed in, if any."""
+        path = os.getenv(RESULT_FILE_ENV)
+        return cls(path) if path else None
+
+    def environment(self) -> dict:
+        """Return the environment to launch Auto-GPT with, with the result channel
+        plugin allowed to load."""
+        allowlist = [
+            name for name in os.getenv("ALLOWLISTED_PLUGINS", "").split(",") if name
+        ]
+        if ResultChannelPlugin.__name__ not in allowlist:
+            allowlist.append(ResultChannelPlugin.__name__)
+        return {
+            **os.environ,
+            RESULT_FILE_ENV: str(self.path),
+            "ALLOWLISTED_PLUGINS": ",".join(allowlist),
+        }
+
+    def reset(self) -> None:
+        """Empty the channel before a new Auto-GPT run."""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_bytes(b"")
+            self._records = []
+            self._offset = 0
+
+    def write(self, command_name: str, arguments: dict) -> None:
+        """Append a command record to the channel.
+
+        Args:
+            command_name (str): The name of the command.
+            arguments (dict): The arguments of the command.
+        """
+        write_result_record(str(self.path), command_name, arguments)
+
+    def read(self) -> List[dict]:
+        """Return every record in the channel, reading only what was appended
+        since the last call.
+
+        A trailing line without a newline is still being written and is left for
+        the next call.
+
+        Returns:
+            List[dict]: The records in the order they were written.
+        """
+        with self._lock:
+            try:
+                with open(self.path, "rb") as channel_file:
+                    channel_file.seek(self._offset)
+                    data = channel_file.read()
+            except FileNotFoundError:
+                return list(self._records)
+            complete = data.rfind(b"\n") + 1
+            for line in data[:complete].splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and "command" in record:
+                    self._records.append(record)
+            self._offset += complete
+            return list(self._records)
+
+    def last_command_arguments(self, command_name: str) -> Optional[dict]:
+        """Return the arguments of the last record for a command.
+
+        Args:
+            command_name (str): The command to look for, e.g. "write_to_file".
+
+        Returns:
+            Optional[dict]: The command arguments, or None if it was not reported.
+        """
+        for record in reversed(self.read()):
+            if record["command"] == command_name:
+                return record.get("arguments") or {}
+        return None
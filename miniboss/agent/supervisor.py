@@ -0,0 +1,250 @@
+"""Supervision of the Auto-GPT subprocess a Buddy launches."""
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from colorama import Fore
+
+from miniboss.logs import logger
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# How often, in seconds, the CPU and memory usage of the subprocess is sampled
+SAMPLE_INTERVAL = 1.0
+# How long, in seconds, a terminated subprocess gets to exit before it is killed
+TERMINATE_GRACE_PERIOD = 10.0
+# The longest output line read from the subprocess
+STREAM_LIMIT = 1024 * 1024
+
+
+class ProcessCancelledError(Exception):
+    """Raised when a supervised process was cancelled."""
+
+
+@dataclasses.dataclass
+class ProcessResult:
+    """The outcome of a supervised subprocess."""
+
+    returncode: Optional[int] = None
+    duration: float = 0.0
+    cpu_seconds: Optional[float] = None
+    peak_rss: Optional[int] = None
+    timed_out: Optional[str] = None
+    cancelled: bool = False
+
+    @property
+    def succeeded(self) -> bool:
+        return self.returncode == 0 and not self.timed_out and not self.cancelled
+
+
+def sample_usage(pid: int) -> Optional[Tuple[float, int]]:
+    """
+    Returns the CPU time and resident memory of a process.
+
+    Uses psutil when it is installed and /proc otherwise.
+
+    Args:
+        pid (int): The process id.
+
+    Returns:
+        Optional[Tuple[float, int]]: The user plus system CPU seconds and the RSS in
+            bytes, or None if they cannot be read.
+    """
+    try:
+        if psutil is not None:
+            process = psutil.Process(pid)
+            cpu_times = process.cpu_times()
+            return cpu_times.user + cpu_times.system, process.memory_info().rss
+        with open(f"/proc/{pid}/stat", "rb") as stat_file:
+            # The command name may contain spaces, the fields after it do not
+            fields = stat_file.read().rsplit(b")", 1)[1].split()
+        ticks = os.sysconf("SC_CLK_TCK")
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+        rss = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+        return cpu_seconds, rss
+    except Exception:
+        return None
+
+
+class ProcessSupervisor:
+    """Runs a subprocess on an asyncio event loop and keeps an eye on it.
+
+    Output is streamed line by line to the logger, the process is terminated when
+    it runs past its wall-clock timeout or stays silent past its idle timeout, and
+    its CPU time and peak memory are reported when it exits. cancel() can be called
+    from any thread to stop the process.
+
+    Attributes:
+        name (str): The name the output and reports are logged under.
+        timeout (float): The wall-clock timeout in seconds, 0 for none.
+        idle_timeout (float): The longest time in seconds without output, 0 for none.
+            Only applies when the output is streamed.
+    """
+
+    def __init__(self, name: str, timeout: float = 0, idle_timeout: float = 0):
+        """Initialize the ProcessSupervisor.
+
+        Args:
+            name (str): The name the output and reports are logged under.
+            timeout (float): The wall-clock timeout in seconds, 0 for none.
+            idle_timeout (float): The longest time in seconds without output, 0 for none.
+        """
+        self.name = name
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.last_output = 0.0
+        self._cancelled = threading.Event()
+        self._loop = None
+        self._wake_up = None
+
+    def cancel(self) -> None:
+        """Stop the supervised process. Safe to call from any thread."""
+        self._cancelled.set()
+        loop, wake_up = self._loop, self._wake_up
+        if loop is not None and wake_up is not None:
+            try:
+                loop.call_soon_threadsafe(wake_up.set)
+            except RuntimeError:
+                # The event loop already finished
+                pass
+
+    def run(
+        self,
+        command: List[str],
+        cwd: Optional[str] = None,
+        env: Optional[dict] = None,
+        stream_output: bool = True,
+    ) -> ProcessResult:
+        """Run a command to completion on a new event loop.
+
+        Args:
+            command (List[str]): The command and its arguments.
+            cwd (str, optional): The working directory of the command.
+            env (dict, optional): The environment of the command.
+            stream_output (bool): Whether to capture the output and log it line by
+                line. Interactive commands should keep the console instead.
+
+        Returns:
+            ProcessResult: The outcome of the command.
+        """
+        return asyncio.run(self.supervise(command, cwd, env, stream_output))
+
+    async def supervise(
+        self,
+        command: List[str],
+        cwd: Optional[str] = None,
+        env: Optional[dict] = None,
+        stream_output: bool = True,
+    ) -> ProcessResult:
+        """Run a command to completion on the running event loop.
+
+        See run() for the arguments.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wake_up = asyncio.Event()
+        result = ProcessResult()
+        started = time.monotonic()
+        self.last_output = started
+
+        pipe = asyncio.subprocess.PIPE if stream_output else None
+        process = await asyncio.create_subprocess_exec(
+            *command, cwd=cwd, env=env, stdout=pipe, stderr=pipe, limit=STREAM_LIMIT
+        )
+        readers = []
+        if stream_output:
+            readers = [
+                asyncio.create_task(self._stream(process.stdout, "")),
+                asyncio.create_task(self._stream(process.stderr, "stderr ")),
+            ]
+
+        waiter = asyncio.create_task(process.wait())
+        woken_up = asyncio.create_task(self._wake_up.wait())
+        while not waiter.done():
+            if self._cancelled.is_set():
+                result.cancelled = True
+                break
+            now = time.monotonic()
+            if self.timeout and now - started > self.timeout:
+                result.timed_out = f"ran for more than {self.timeout}s"
+                break
+            if (
+                stream_output
+                and self.idle_timeout
+                and now - self.last_output > self.idle_timeout
+            ):
+                result.timed_out = f"printed nothing for {self.idle_timeout}s"
+                break
+            usage = sample_usage(process.pid)
+            if usage is not None:
+                result.cpu_seconds = usage[0]
+                result.peak_rss = max(result.peak_rss or 0, usage[1])
+            await asyncio.wait(
+                [waiter, woken_up],
+                timeout=SAMPLE_INTERVAL,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+
+        woken_up.cancel()
+        if not waiter.done():
+            await self._stop(process, waiter)
+        result.returncode = waiter.result()
+        if readers:
+            # Processes Auto-GPT started may still hold the pipes open
+            _, unfinished = await asyncio.wait(readers, timeout=TERMINATE_GRACE_PERIOD)
+            for reader in unfinished:
+                reader.cancel()
+        result.duration = time.monotonic() - started
+        self._loop = None
+        self._report(result)
+        return result
+
+    async def _stream(self, stream: asyncio.StreamReader, prefix: str) -> None:
+        while True:
+            try:
+                line = await stream.readline()
+            except ValueError:
+                # A line longer than STREAM_LIMIT, skip what was buffered of it
+                continue
+            if not line:
+                return
+            self.last_output = time.monotonic()
+            logger.info(
+                line.decode("utf-8", errors="replace").rstrip(),
+                f"{self.name} {prefix}",
+                Fore.BLUE,
+            )
+
+    async def _stop(self, process, waiter) -> None:
+        process.terminate()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), TERMINATE_GRACE_PERIOD)
+        except asyncio.TimeoutError:
+            process.kill()
+            await waiter
+
+    def _report(self, result: ProcessResult) -> None:
+        usage = ""
+        if result.cpu_seconds is not None:
+            usage += f", cpu {result.cpu_seconds:.1f}s"
+        if result.peak_rss is not None:
+            usage += f", peak rss {result.peak_rss / 1024 / 1024:.1f} MB"
+        summary = f"exited with {result.returncode} after {result.duration:.1f}s{usage}"
+        if result.cancelled:
+            logger.warn(f"Auto-GPT was cancelled and {summary}", f"{self.name}: ")
+        elif result.timed_out:
+            logger.warn(
+                f"Auto-GPT {result.timed_out} and was stopped, it {summary}",
+                f"{self.name}: ",
+            )
+        elif result.returncode != 0:
+            logger.warn(f"Auto-GPT {summary}", f"{self.name}: ")
+        else:
+            logger.debug(f"Auto-GPT {summary}", f"{self.name}: ")
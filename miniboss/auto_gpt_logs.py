@@ -0,0 +1,169 @@
+"""Read the commands Auto-GPT records in its activity log.
+
+The activity log only ever grows, so lookups read it backwards from the end in
+blocks and stop at the first match. A Buddy remembers the size of the log when
+it launched Auto-GPT, which bounds the lookup to the bytes written by that run.
+"""
+from __future__ import annotations
+
+import ast
+import os
+import re
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+BLOCK_SIZE = 64 * 1024
+
+COMMAND_PATTERNS = {
+    "task_complete": re.compile(rb"COMMAND = task_complete\s+ARGUMENTS = ({.*})"),
+    "write_to_file": re.compile(rb"COMMAND = write_to_file\s+ARGUMENTS = ({.*})"),
+}
+
+
+def get_log_file_path(target_directory: str | Path) -> Path:
+    """
+    Returns the path of the Auto-GPT activity log.
+
+    Args:
+        target_directory (str | Path): The Auto-GPT directory.
+
+    Returns:
+        Path: The path to the activity log.
+    """
+    return Path(target_directory) / "logs" / "activity.log"
+
+
+def get_log_offset(target_directory: str | Path) -> int:
+    """
+    Returns the current size of the Auto-GPT activity log.
+
+    Record this before launching Auto-GPT and pass it as `start_offset` to only
+    search what that run logged.
+
+    Args:
+        target_directory (str | Path): The Auto-GPT directory.
+
+    Returns:
+        int: The size of the activity log in bytes, 0 if it does not exist yet.
+    """
+    try:
+        return os.path.getsize(get_log_file_path(target_directory))
+    except OSError:
+        return 0
+
+
+def iter_lines_reversed(
+    log_file_path: str | Path, start_offset: int = 0, block_size: int = BLOCK_SIZE
+) -> Iterator[bytes]:
+    """
+    Yields the lines of a file from last to first, reading it backwards in blocks.
+
+    Args:
+        log_file_path (str | Path): The path of the file to read.
+        start_offset (int): The byte offset to stop reading at. If the file is
+            smaller than the offset, it was truncated and is read in full.
+        block_size (int): The number of bytes read at a time.
+
+    Yields:
+        bytes: The lines of the file, without line endings, last line first.
+    """
+    with open(log_file_path, "rb") as log_file:
+        position = log_file.seek(0, os.SEEK_END)
+        if start_offset > position:
+            start_offset = 0
+        remainder = b""
+        while position > start_offset:
+            read_size = min(block_size, position - start_offset)
+            position -= read_size
+            log_file.seek(position)
+            lines = (log_file.read(read_size) + remainder).split(b"\n")
+            # The first line may continue in the previous block
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                yield line.rstrip(b"\r")
+        if remainder:
+            yield remainder.rstrip(b"\r")
+
+
+def find_last_command_arguments(
+    target_directory: str | Path, command_name: str, start_offset: int = 0
+) -> Optional[dict]:
+    """
+    Returns the arguments of the last time Auto-GPT ran a command.
+
+    Args:
+        target_directory (str | Path): The Auto-GPT directory.
+        command_name (str): The command to look for, e.g. "task_complete".
+        start_offset (int): The byte offset in the log to search from.
+
+    Returns:
+        Optional[dict]: The command arguments, or None if the command was not found.
+    """
+    pattern = COMMAND_PATTERNS[command_name]
+    marker = f"COMMAND = {command_name}".encode()
+    for line in iter_lines_reversed(get_log_file_path(target_directory), start_offset):
+        if marker not in line:
+            continue
+        match = pattern.search(line)
+        if not match:
+            continue
+        try:
+            return ast.literal_eval(match.group(1).decode("utf-8"))
+        except (ValueError, SyntaxError):
+            continue
+    return None
+
+
+def clean_task_complete_reason(reason: str) -> str:
+    """
+    Removes the single and double quotes Auto-GPT leaves around a reason.
+
+    Args:
+        reason (str): The reason argument of the task_complete command.
+
+    Returns:
+        str: The cleaned up reason.
+    """
+    return reason.strip("'\"").replace("'", "")
+
+
+def find_task_complete_reason(
+    target_directory: str | Path, start_offset: int = 0
+) -> str:
+    """
+    Returns the reason Auto-GPT gave the last time it completed its task.
+
+    Args:
+        target_directory (str | Path): The Auto-GPT directory.
+        start_offset (int): The byte offset in the log to search from.
+
+    Returns:
+        str: The reason for task completion, or an empty string if not found.
+    """
+    arguments = find_last_command_arguments(
+        target_directory, "task_complete", start_offset
+    )
+    if arguments is None:
+        return ""
+    return clean_task_complete_reason(arguments["reason"])
+
+
+def find_written_file(
+    target_directory: str | Path, start_offset: int = 0
+) -> Tuple[str, str]:
+    """
+    Returns the last file Auto-GPT wrote with the write_to_file command.
+
+    Args:
+        target_directory (str | Path): The Auto-GPT directory.
+        start_offset (int): The byte offset in the log to search from.
+
+    Returns:
+        Tuple[str, str]: The file name and text, or empty strings if not found.
+    """
+    arguments = find_last_command_arguments(
+        target_directory, "write_to_file", start_offset
+    )
+    if arguments is None:
+        return "", ""
+    return arguments["filename"], arguments["text"]
@@ -4,10 +4,26 @@ from pathlib import Path
 from colorama import Fore, Style
 
 from miniboss.agent.buddy import Buddy
+from miniboss.agent.result_channel import ResultChannel, can_read_shared_log
 from miniboss.app import execute_command, get_command
+from miniboss.auto_gpt_logs import find_written_file, get_log_offset
+from miniboss.boss.journal import (
+    JOURNAL_FILE_NAME,
+    RunJournal,
+    get_job_id,
+    new_run_id,
+)
+from miniboss.boss.scheduler import BuddyScheduler
+from miniboss.boss.scoring import RegexScorer, get_scorer
 from miniboss.config.config import Config
+from miniboss.config.persistence import DebouncedSaver
 from miniboss.json_utils.utilities import LLM_DEFAULT_RESPONSE_FORMAT, validate_json
 from miniboss.llm import create_chat_completion, create_chat_message
+from miniboss.llm.retry import (
+    CircuitOpenError,
+    is_api_unavailable,
+    log_api_unavailable,
+)
 from miniboss.logs import logger
 from miniboss.prompts.prompt import (
     DEFAULT_BUDDY_TRIGGERING_PROMPT,
@@ -22,11 +38,9 @@ from miniboss.utils import clean_input, send_chat_message_to_user
 from miniboss.workspace import Jobspace
 
 cfg = Config()
-import ast
 import os
-import re
-
-from transformers import pipeline
+import threading
+import time
 
 
 class Boss:
@@ -59,10 +73,17 @@ class Boss:
 
     Methods:
         start_interaction_loop(): Starts the interaction loop.
+        run_tasks(): Runs a Buddy for every task that is not complete yet.
+        cancel_buddies(): Stops the Auto-GPT subprocess of every running Buddy.
+        run_buddy_task(i, task, dependencies): Runs a Buddy for a single task and records its results.
+        build_current_job(task, dependencies): Builds the job description handed to a Buddy.
         evaluate_worker_performance(feedback): Evaluates the worker's performance based on the feedback.
         set_results_for_tasks(): Sets the results for the tasks.
+        record_results(i, event, **changes): Records a transition that changed a task's results.
+        pause_for_api(error, cfg): Decides whether the Boss goes on after the OpenAI API did not respond.
         _resolve_pathlike_command_args(command_args): Resolves path-like command arguments.
-        parse_auto_gpt_logs(): Parses the auto-gpt logs.
+        get_reported_file(i, task_results): Gets the last file a finished Buddy wrote.
+        parse_auto_gpt_logs(start_offset): Parses the auto-gpt logs.
         get_self_feedback(thoughts, llm_model): Generates self-feedback based on the thoughts.
         get_self_feedback_on_buddy(thoughts, llm_model, results): Generates self-feedback on the agent based on the thoughts and results.
         log_and_save_results(logger, buddy_name, status, markdown_text, config, i, performance_grade, target_percentage, CFG): Logs and saves the results.
@@ -127,6 +148,14 @@ class Boss:
         self.triggering_prompt = triggering_prompt
         self.workspace = Jobspace(workspace_directory, cfg.restrict_to_workspace)
         self.max_workers = max_workers
+        self._config_lock = threading.Lock()
+        self.config_saver = DebouncedSaver(self.write_config, CFG.boss_save_debounce)
+        self.running_buddies = {}
+        self.journal = RunJournal(
+            self.workspace.root / JOURNAL_FILE_NAME,
+            get_job_id(config.ai_job, config.ai_tasks),
+            config.run_id or None,
+        )
 
     def start_interaction_loop(self):
         """Start the interaction loop for the Boss class.
@@ -149,8 +178,7 @@ class Boss:
         command_name = None
         arguments = None
         user_input = ""
-        buddy_workspace_directory = None
-        assistant_reply_json = {}
+        task_index = 0
         while True:
             # Discontinue if continuous limit is reached
             loop_count += 1
@@ -169,147 +197,19 @@ class Boss:
 
             send_chat_message_to_user("Thinking... \n")
 
-            # for i, task in enumerate(self.config.ai_tasks, start=1):
-            for i, task in enumerate(self.config.ai_tasks):
-                buddy_name = "Buddy-{}".format(i)
-                BUDDY_JOB_COMPLETE = False
-
-                if len(self.config.ai_task_results):
-                    if self.config.ai_task_results[i]["status"] == "complete":
-                        complete_precent = (i + 1) / len(self.config.ai_tasks)
-                        self.config.complete_percentage = complete_precent
-                        self.config.save(CFG.boss_settings_file)
-                        if len(self.config.ai_task_results[i]["results"]) == 0:
-                            file_name, text = self.parse_auto_gpt_logs()
-                            # print("FILE NAME: ", file_name)
-                            # print("TEXT: ", text)
-                            self.config.ai_task_results[i]["results"] = []
-                            self.config.ai_task_results[i]["results"].append(
-                                {"file_name": file_name, "text": text}
-                            )
-                            self.config.save(CFG.boss_settings_file)
-                        continue
-                    elif self.config.ai_task_results[i]["status"] == "started":
-                        buddy_config = construct_main_buddy_config(
-                            task, self.config.target_percentage, buddy_name
-                        )
-
-                    else:
-                        buddy_config = create_main_buddy_config(
-                            task, self.config.target_percentage, buddy_name
-                        )
-
-                assistant_reply_json = {}
-                buddy_config.command_registry = self.command_registry
-                buddy_message_history = []
-                buddy_action_count = 0
-
-                while not BUDDY_JOB_COMPLETE:
-                    if buddy_workspace_directory is None:
-                        workspace_name = "miniboss_workspace/agent-{}-workspace".format(
-                            i
-                        )
-                        buddy_workspace_directory = (
-                            Path(__file__).parent.parent.parent / workspace_name
-                        )
-                    else:
-                        buddy_workspace_directory = Path(buddy_workspace_directory)
-                    workspace_directory = Jobspace.make_workspace(
-                        buddy_workspace_directory
-                    )
-
-                    current_job = task
-
-                    if i != 0:
-                        previous_results = self.config.ai_task_results[i - 1]
-                        updated_results = json.dumps(previous_results)
-                        # print("UPDATED RESULTS: ", updated_results)
-                        prep_results = (
-                            updated_results.replace("{", "")
-                            .replace("}", "")
-                            .replace("[", "")
-                            .replace("]", "")
-                            .replace("\\", "")
-                        )
-                        previous_job = (
-                            f"Please consider the previous job: {prep_results} "
-                        )
-                        current_job = (
-                            f"{previous_job} while completing your new job: {task}"
-                        )
-
-                    buddy = Buddy(
-                        ai_name=buddy_name,
-                        memory=self.memory,
-                        full_message_history=buddy_message_history,
-                        next_action_count=buddy_action_count,
-                        command_registry=self.command_registry,
-                        config=buddy_config,
-                        system_prompt=buddy_config.construct_full_prompt(),
-                        triggering_prompt=DEFAULT_BUDDY_TRIGGERING_PROMPT,
-                        current_job=current_job,
-                        workspace_directory=workspace_directory,
-                    )
-                    # print(self.config.ai_task_results[i]["worker_count"])
-                    self.config.ai_task_results[i]["worker_count"] += 1
-                    self.config.ai_task_results[i]["status"] = "started"
-                    # print(self.config.ai_task_results[i]["worker_count"])
-                    self.config.save(CFG.boss_settings_file)
-                    buddy.start_interaction_loop()
-
-                    # Extract relevant information from final_result
-                    task = buddy.final_result["task"]
-                    feedback = buddy.final_result["feedback"]
-                    arguments = buddy.final_result["arguments"]
-                    # Create a new dictionary with all values from final_result
-                    new_final_result = buddy.final_result.copy()
-                    # Use the evaluation function to grade the worker's performance
-                    # todo: this is invalid - because a worker can fail
-                    performance_grade = self.evaluate_worker_performance_hf(feedback)
-                    new_final_result["performance_grade"] = performance_grade
-                    self.config.ai_task_results[i]["score"] = performance_grade
-                    complete_precent = (i + 1) / len(self.config.ai_tasks)
-                    self.config.complete_percentage = complete_precent
-
-                    file_name, text = self.parse_auto_gpt_logs()
-                    self.config.ai_task_results[i]["results"] = []
-                    self.config.ai_task_results[i]["results"].append(
-                        {"file_name": file_name, "text": text}
-                    )
-                    self.config.ai_task_results[i]["status"] = "complete"
-                    self.config.save(CFG.boss_settings_file)
-
-                    # In your main function/method:
-                    markdown_text = f"# 🚀 {buddy_name} : "
-                    if performance_grade >= self.config.target_percentage:
-                        markdown_text += f"Success : {performance_grade}/ {self.config.target_percentage} 🚀"
-                        status = "complete"
-                        complete_precent = (i + 1) / len(self.config.ai_tasks)
-                        self.config.complete_percentage = complete_precent
-                    else:
-                        markdown_text += f"Failed : {performance_grade}/ {self.config.target_percentage} 🚀"
-                        status = "fail"
-
-                    self.log_and_save_results(
-                        logger,
-                        buddy_name,
-                        status,
-                        markdown_text,
-                        self.config,
-                        i,
-                        performance_grade,
-                        self.config.target_percentage,
-                        CFG,
-                    )
-                    assistant_reply_json = self.build_assistant_reply(
-                        status,
-                        i,
-                        task,
-                        buddy_name,
-                        performance_grade,
-                        self.config.target_percentage,
-                    )
-                    BUDDY_JOB_COMPLETE = True
+            # Keep the reply of the last task that actually ran a Buddy
+            assistant_reply_json = {}
+            try:
+                task_replies = self.run_tasks()
+            except Exception as e:
+                if not is_api_unavailable(e):
+                    raise
+                if self.pause_for_api(e, cfg):
+                    continue
+                break
+            for i, task_reply_json in task_replies.items():
+                if task_reply_json:
+                    task_index, assistant_reply_json = i, task_reply_json
 
             if assistant_reply_json != {}:
                 validate_json(assistant_reply_json, LLM_DEFAULT_RESPONSE_FORMAT)
@@ -323,7 +223,7 @@ class Boss:
                     self_feedback_resp = self.get_self_feedback_on_buddy(
                         thoughts,
                         cfg.fast_llm_model,
-                        self.config.ai_task_results[i]["results"][0],
+                        self.config.ai_task_results[task_index]["results"][0],
                     )
 
                     display_feedback = self_feedback_resp.replace(
@@ -347,6 +247,10 @@ class Boss:
                     arguments = self._resolve_pathlike_command_args(arguments)
 
                 except Exception as e:
+                    if is_api_unavailable(e):
+                        if self.pause_for_api(e, cfg):
+                            continue
+                        break
                     logger.error("Error: \n", str(e))
 
             # MiniBoss is complete
@@ -424,6 +328,297 @@ class Boss:
                     "SYSTEM: ", Fore.YELLOW, "Unable to execute command"
                 )
 
+    def run_tasks(self):
+        """Run a Buddy for every task that is not complete yet.
+
+        The tasks are handed to a `BuddyScheduler` in dependency order: a task
+        starts as soon as the tasks it depends on have finished, with up to
+        `max_workers` Buddies running at the same time. Tasks without declared
+        dependencies depend on the previous task when there is a single worker,
+        and are independent when there are several.
+
+        Returns:
+            dict: The assistant reply JSON of each task keyed by task index, in task
+                order. Tasks that were already complete map to an empty dict.
+
+        Raises:
+            Exception: The last error of a Buddy that failed because the OpenAI API
+                did not respond, once every other Buddy has finished.
+        """
+        tasks = self.config.ai_tasks
+        dependencies = self.config.get_task_dependencies(
+            independent_by_default=self.max_workers > 1
+        )
+        scheduler = BuddyScheduler(self.max_workers)
+        api_errors = []
+
+        def run_task(i):
+            try:
+                return self.run_buddy_task(i, tasks[i], dependencies[i])
+            except Exception as e:
+                if is_api_unavailable(e):
+                    api_errors.append(e)
+                raise
+
+        try:
+            task_replies = scheduler.run(
+                range(len(tasks)),
+                run_task,
+                dependencies,
+                cancel=self.cancel_buddies,
+            )
+        finally:
+            self.config_saver.flush()
+        if api_errors:
+            raise api_errors[-1]
+        return task_replies
+
+    def pause_for_api(self, error, cfg):
+        """Decide whether the Boss goes on after the OpenAI API did not respond.
+
+        While the circuit breaker is open the Boss pauses until it lets a request
+        through again, then goes on. A request whose retries were used up stops the
+        Boss, or raises the error in debug mode. Unfinished tasks resume on the
+        next run.
+
+        Args:
+            error (Exception): The error the request failed with.
+            cfg (Config): The configuration.
+
+        Returns:
+            bool: True if the interaction loop should go on.
+        """
+        log_api_unavailable(error)
+        if isinstance(error, CircuitOpenError):
+            logger.typewriter_log(
+                "PAUSING FOR ",
+                Fore.YELLOW,
+                f"{cfg.openai_circuit_breaker_timeout:.0f} seconds",
+            )
+            time.sleep(cfg.openai_circuit_breaker_timeout)
+            return True
+        if cfg.debug_mode:
+            raise error
+        return False
+
+    def cancel_buddies(self):
+        """Stop the Auto-GPT subprocess of every running Buddy."""
+        for buddy in list(self.running_buddies.values()):
+            buddy.cancel()
+
+    def run_buddy_task(self, i, task, dependencies=()):
+        """Launch a Buddy for a single task and record its results.
+
+        Args:
+            i (int): The index of the task.
+            task (str): The task description.
+            dependencies (list): The indices of the tasks whose results are passed
+                to the Buddy.
+
+        Returns:
+            dict: The assistant reply JSON for the task, or an empty dict if the task
+                was already complete.
+        """
+        buddy_name = "Buddy-{}".format(i)
+        task_results = self.config.ai_task_results[i]
+
+        if task_results["status"] == "complete":
+            if len(task_results["results"]) == 0:
+                file_name, text = self.get_reported_file(i, task_results)
+                with self._config_lock:
+                    task_results["results"] = [{"file_name": file_name, "text": text}]
+                self.record_results(i, "results")
+            with self._config_lock:
+                self.update_complete_percentage()
+            self.save_config()
+            return {}
+
+        workspace_directory = Jobspace.make_workspace(
+            self.get_buddy_workspace_directory(i)
+        )
+        buddy_settings_file = self.get_buddy_settings_file(i)
+        if task_results["status"] == "started":
+            buddy_config = construct_main_buddy_config(
+                task, self.config.target_percentage, buddy_name, buddy_settings_file
+            )
+        else:
+            buddy_config = create_main_buddy_config(
+                task, self.config.target_percentage, buddy_name, buddy_settings_file
+            )
+        buddy_config.command_registry = self.command_registry
+        current_job = self.build_current_job(task, dependencies)
+
+        buddy = Buddy(
+            ai_name=buddy_name,
+            memory=self.memory,
+            full_message_history=[],
+            next_action_count=0,
+            command_registry=self.command_registry,
+            config=buddy_config,
+            system_prompt=buddy_config.construct_full_prompt(),
+            triggering_prompt=DEFAULT_BUDDY_TRIGGERING_PROMPT,
+            current_job=current_job,
+            workspace_directory=workspace_directory,
+            settings_file=buddy_settings_file,
+        )
+        with self._config_lock:
+            task_results["worker_count"] += 1
+            task_results["status"] = "started"
+            task_results["log_offset"] = get_log_offset(f"{os.getcwd()}/auto-gpt")
+        self.journal.record(
+            i,
+            "started",
+            status="started",
+            worker_count=task_results["worker_count"],
+            log_offset=task_results["log_offset"],
+        )
+        self.save_config()
+        self.running_buddies[i] = buddy
+        try:
+            buddy.start_interaction_loop()
+        finally:
+            del self.running_buddies[i]
+
+        # Extract relevant information from final_result
+        task = buddy.final_result["task"]
+        feedback = buddy.final_result["feedback"]
+        # Use the evaluation function to grade the worker's performance
+        # todo: this is invalid - because a worker can fail
+        performance_grade = self.evaluate_worker_performance_hf(feedback)
+
+        file_name, text = buddy.get_written_file()
+        # The status is set by log_and_save_results, once the grade decided it
+        with self._config_lock:
+            task_results["score"] = performance_grade
+            task_results["results"] = [{"file_name": file_name, "text": text}]
+
+        markdown_text = f"# 🚀 {buddy_name} : "
+        if performance_grade >= self.config.target_percentage:
+            markdown_text += (
+                f"Success : {performance_grade}/ {self.config.target_percentage} 🚀"
+            )
+            status = "complete"
+        else:
+            markdown_text += (
+                f"Failed : {performance_grade}/ {self.config.target_percentage} 🚀"
+            )
+            status = "fail"
+
+        self.log_and_save_results(
+            logger,
+            buddy_name,
+            status,
+            markdown_text,
+            self.config,
+            i,
+            performance_grade,
+            self.config.target_percentage,
+            CFG,
+        )
+        return self.build_assistant_reply(
+            status,
+            i,
+            task,
+            buddy_name,
+            performance_grade,
+            self.config.target_percentage,
+        )
+
+    def build_current_job(self, task, dependencies):
+        """Build the job description handed to a Buddy.
+
+        Only the task and results of the tasks it depends on are included, so the
+        prompt does not grow with the whole plan.
+
+        Args:
+            task (str): The task description.
+            dependencies (list): The indices of the tasks the task depends on.
+
+        Returns:
+            str: The job description for the Buddy.
+        """
+        if not dependencies:
+            return task
+        previous_results = [
+            {
+                "task": self.config.ai_task_results[dependency]["task"],
+                "results": self.config.ai_task_results[dependency]["results"],
+            }
+            for dependency in dependencies
+        ]
+        updated_results = json.dumps(previous_results)
+        prep_results = (
+            updated_results.replace("{", "")
+            .replace("}", "")
+            .replace("[", "")
+            .replace("]", "")
+            .replace("\\", "")
+        )
+        previous_job = f"Please consider the previous job: {prep_results} "
+        return f"{previous_job} while completing your new job: {task}"
+
+    def get_buddy_workspace_directory(self, i):
+        """Get the workspace directory of the Buddy working on a task.
+
+        Args:
+            i (int): The index of the task.
+
+        Returns:
+            Path: The workspace directory of the Buddy.
+        """
+        workspace_name = "miniboss_workspace/agent-{}-workspace".format(i)
+        return Path(__file__).parent.parent.parent / workspace_name
+
+    def get_buddy_settings_file(self, i):
+        """Get the settings file of the Buddy working on a task.
+
+        A single Buddy uses the configured buddy settings file. When several
+        Buddies run at the same time each one keeps its settings in its own
+        workspace so they do not overwrite each other.
+
+        Args:
+            i (int): The index of the task.
+
+        Returns:
+            str: The path to the Buddy settings file.
+        """
+        if self.max_workers > 1:
+            return str(self.get_buddy_workspace_directory(i) / "buddy_settings.yaml")
+        return CFG.buddy_settings_file
+
+    def update_complete_percentage(self):
+        """Update the share of tasks that have been worked to completion.
+
+        Returns:
+            None
+        """
+        finished = sum(
+            1
+            for task_results in self.config.ai_task_results
+            if task_results["status"] in ("complete", "fail")
+        )
+        self.config.complete_percentage = finished / len(self.config.ai_tasks)
+
+    def save_config(self):
+        """Request a save of the Boss configuration.
+
+        Saves requested within `BOSS_SAVE_DEBOUNCE` seconds of each other are written
+        once, and any pending save is written when the process exits.
+
+        Returns:
+            None
+        """
+        self.config_saver.request()
+
+    def write_config(self):
+        """Write the Boss configuration, serializing writes from concurrent Buddies.
+
+        Returns:
+            None
+        """
+        with self._config_lock:
+            self.config.save(CFG.boss_settings_file)
+
     def evaluate_worker_performance(self, feedback: str) -> float:
         """Evaluate the performance of a worker based on the provided feedback.
 
@@ -436,19 +631,13 @@ class Boss:
         Returns:
             float: The performance score, normalized to a scale of 0-1.
         """
-        score_search = re.search(r"\b\d{1,2}\b", feedback)
-        if score_search:
-            score = float(score_search.group())
-            # normalize to a scale of 0-1
-            return score / 10
-        else:
-            # if no score was found in the feedback, handle accordingly
-            return 0.20
+        return RegexScorer().score(feedback)
 
     def evaluate_worker_performance_hf(self, feedback: str) -> float:
-        """Evaluate the performance of a worker based on the provided feedback using the Hugging Face sentiment analysis model.
+        """Evaluate the performance of a worker based on the provided feedback using the configured scorer.
 
-        This method calculates a performance score for a worker based on the sentiment analysis of the feedback received.
+        By default this is the Hugging Face sentiment analysis model, which is loaded once per
+        process and scores feedback from concurrent Buddies in a single batch.
         The score is normalized to a scale of 0-1, with 1 being the highest performance.
 
         Args:
@@ -457,13 +646,7 @@ class Boss:
         Returns:
             float: The performance score, normalized to a scale of 0-1.
         """
-        hf_analysis = pipeline("sentiment-analysis")(feedback)
-
-        if len(hf_analysis) > 0:
-            return hf_analysis[0]["score"]
-        else:
-            # If no score was found in the feedback, handle accordingly
-            return self.evaluate_worker_performance(feedback)
+        return get_scorer(CFG).score(feedback)
 
     def set_results_for_tasks(self):
         """Set the initial results structure for each task.
@@ -471,7 +654,10 @@ class Boss:
         This method initializes the results structure for each task in the `ai_task_results` list.
         If the `ai_task_results` list is empty, it creates a results dictionary for each task
         and appends it to the list. The initial values for `worker_count`, `status`, and `score`
-        are set to 0.
+        are set to 0, and a new run is started in the run journal. Otherwise the task state
+        transitions recorded for the run in the journal are replayed on top, so a resumed job
+        continues from its last recorded state. Task results saved before runs had an id
+        start a new run.
 
         Note:
             This method assumes that the necessary configurations are already set in the Boss instance.
@@ -479,7 +665,8 @@ class Boss:
         Returns:
             None
         """
-        if len(self.config.ai_task_results) == 0:
+        fresh = len(self.config.ai_task_results) == 0
+        if fresh:
             for i, task in enumerate(self.config.ai_tasks):
                 self.config.ai_task_results.append(
                     {
@@ -491,7 +678,39 @@ class Boss:
                     }
                 )
 
-        self.config.save(CFG.boss_settings_file)
+        if fresh or not self.config.run_id:
+            self.config.run_id = new_run_id()
+            self.journal.start_run(self.config.run_id)
+            # Save the run id before any of its transitions are recorded
+            self.save_config()
+            self.config_saver.flush()
+            return
+
+        # The journal may be ahead of the settings file if Mini-Boss was stopped
+        # before its last save
+        self.journal.run_id = self.config.run_id
+        if self.journal.replay(self.config.ai_task_results):
+            self.config.load_task_results(CFG.boss_settings_file)
+            self.update_complete_percentage()
+        self.save_config()
+
+    def record_results(self, i, event, **changes):
+        """Record a transition of a task that changed its results in the run journal.
+
+        The results are appended to the result store, and the journal only records their
+        offset and digest.
+
+        Args:
+            i (int): The index of the task.
+            event (str): The name of the transition.
+            **changes: The other task result fields the transition changed.
+
+        Returns:
+            None
+        """
+        with self._config_lock:
+            location = self.config.store_task_results(i, CFG.boss_settings_file)
+        self.journal.record(i, event, **changes, **location)
 
     def _resolve_pathlike_command_args(self, command_args):
         """Resolve path-like command arguments.
@@ -516,41 +735,49 @@ class Boss:
                     )
         return command_args
 
-    def parse_auto_gpt_logs(self):
-        """Parse the auto-gpt logs to extract task complete information.
+    def get_reported_file(self, i, task_results):
+        """Get the last file a finished Buddy's Auto-GPT wrote.
 
-        This method reads the auto-gpt log file in reverse and searches for the "task_complete"
-        command and its arguments. It returns the file name and text obtained from the command.
+        The Buddy's result channel is read first, then, when Buddies run one at a
+        time, the activity log written since the Buddy was launched.
+
+        Args:
+            i (int): The index of the task.
+            task_results (dict): The results recorded for the task.
 
         Returns:
-            tuple: A tuple containing the file name and text obtained from the task complete command.
-                   If the task complete command is not found, empty strings are returned.
+            tuple: The file name and text, or empty strings if not found.
+        """
+        result_channel = ResultChannel.for_workspace(
+            self.get_buddy_workspace_directory(i)
+        )
+        arguments = result_channel.last_command_arguments("write_to_file")
+        if arguments is not None:
+            return arguments.get("filename", ""), arguments.get("text", "")
+        if not can_read_shared_log(self.max_workers):
+            return "", ""
+        return self.parse_auto_gpt_logs(task_results.get("log_offset", 0))
+
+    def parse_auto_gpt_logs(self, start_offset=0):
+        """Parse the auto-gpt logs to extract the last file written.
+
+        This method reads the auto-gpt log file backwards from the end and searches for
+        the "write_to_file" command and its arguments. It returns the file name and text
+        obtained from the command.
+
+        Args:
+            start_offset (int): The byte offset in the log to search from, as recorded
+                when the Buddy was launched.
+
+        Returns:
+            tuple: A tuple containing the file name and text obtained from the command.
+                   If the command is not found, empty strings are returned.
         """
-        # Define the log file path
         target_directory = f"{os.getcwd()}/auto-gpt"
-        log_file_path = os.path.join(target_directory, "logs/activity.log")
-        # Read the log file in reverse
-        with open(log_file_path, "r", encoding="utf-8") as log_file:
-            lines = log_file.readlines()
-            lines.reverse()
-        # Define a regular expression pattern to match the "task_complete" command and its arguments
-        pattern = r"COMMAND = write_to_file\s+ARGUMENTS = ({.*})"
-        # Search for the pattern in the reversed log content
-        text = ""
-        file_name = ""
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                arguments_str = match.group(1)
-                # Parse the string to a Python dictionary
-                arguments = ast.literal_eval(arguments_str)
-                # Access the 'reason' value
-                file_name = arguments["filename"]
-                text = arguments["text"]
-                return file_name, text
-        else:
+        file_name, text = find_written_file(target_directory, start_offset)
+        if not file_name:
             print("Task complete command not found in the log file.")
-            return file_name, text
+        return file_name, text
 
     def get_self_feedback(self, thoughts: dict, llm_model: str) -> str:
         """Generate feedback based on thoughts dictionary.
@@ -673,8 +900,13 @@ Please also provide a detailed explanation for your rating and, if applicable, s
             None
         """
         logger.log_markdown(markdown_text)
-        config.ai_task_results[i]["status"] = status
-        config.save(CFG.boss_settings_file)
+        with self._config_lock:
+            config.ai_task_results[i]["status"] = status
+            self.update_complete_percentage()
+        self.record_results(
+            i, status, status=status, score=config.ai_task_results[i]["score"]
+        )
+        self.save_config()
         logger.typewriter_log(
             f"\n{buddy_name} : {status.upper()} ",
             Fore.GREEN if status == "complete" else Fore.RED,
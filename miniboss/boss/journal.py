@@ -0,0 +1,190 @@
+"""An append-only journal of the Boss's task state transitions."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from miniboss.logs import logger
+
+JOURNAL_FILE_NAME = "boss_journal.jsonl"
+
+
+def get_job_id(ai_job: str, ai_tasks: List[str]) -> str:
+    """Return an id that identifies a job by its description and tasks.
+
+    Args:
+        ai_job (str): The job description.
+        ai_tasks (List[str]): The tasks of the job.
+
+    Returns:
+        str: The job id.
+    """
+    job = json.dumps([ai_job, ai_tasks], ensure_ascii=False)
+    return hashlib.sha256(job.encode("utf-8")).hexdigest()[:16]
+
+
+def new_run_id() -> str:
+    """Return a new id for a run of a job."""
+    return uuid.uuid4().hex[:16]
+
+
+class RunJournal:
+    """A JSON-lines file with one record per task state transition.
+
+    Each record holds the task fields that changed, so replaying the records of a
+    run in order rebuilds its task results even when the process was killed
+    before the settings yaml was saved. A run starts when the task results of a
+    job are initialized, and its id is saved in the settings yaml, so only the
+    records of the run being resumed are replayed. The records carry a
+    timestamp, and finished tasks their duration, so the journal doubles as an
+    audit trail of how long each task took.
+
+    Attributes:
+        path (Path): The path of the journal.
+        job_id (str): The id of the job records are written for.
+        run_id (Optional[str]): The id of the run records are written for.
+    """
+
+    def __init__(
+        self, path: str | Path, job_id: str, run_id: Optional[str] = None
+    ) -> None:
+        """Initialize the RunJournal.
+
+        Args:
+            path (str | Path): The path of the journal.
+            job_id (str): The id of the job records are written for.
+            run_id (str, optional): The id of the run records are written for.
+        """
+        self.path = Path(path)
+        self.job_id = job_id
+        self.run_id = run_id
+        self._lock = threading.Lock()
+        self._started = {}
+
+    def start_run(self, run_id: str) -> None:
+        """Start writing records for a new run of the job, and drop the records of
+        its earlier runs from the journal.
+
+        Args:
+            run_id (str): The id of the new run.
+        """
+        with self._lock:
+            self.run_id = run_id
+            self._started = {}
+            try:
+                with open(self.path, "rb") as journal_file:
+                    lines = journal_file.readlines()
+            except FileNotFoundError:
+                return
+            kept = []
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("job") != self.job_id:
+                    kept.append(line if line.endswith(b"\n") else line + b"\n")
+            if len(kept) == len(lines):
+                return
+            file_descriptor, temp_path = tempfile.mkstemp(
+                prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent
+            )
+            try:
+                with os.fdopen(file_descriptor, "wb") as journal_file:
+                    journal_file.writelines(kept)
+                    journal_file.flush()
+                    os.fsync(journal_file.fileno())
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+
+    def record(self, task_index: int, event: str, **changes) -> None:
+        """Append a state transition of a task to the journal.
+
+        Args:
+            task_index (int): The index of the task.
+            event (str): The name of the transition, e.g. "started".
+            **changes: The task result fields the transition changed.
+        """
+        now = time.time()
+        entry = {
+            "time": now,
+            "job": self.job_id,
+            "run": self.run_id,
+            "task": task_index,
+            "event": event,
+        }
+        if event == "started":
+            self._started[task_index] = now
+        elif task_index in self._started:
+            entry["duration"] = now - self._started.pop(task_index)
+        entry["changes"] = changes
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a+b") as journal_file:
+                # Start a new line if a crash cut the last record short
+                if journal_file.seek(0, os.SEEK_END) > 0:
+                    journal_file.seek(-1, os.SEEK_END)
+                    if journal_file.read(1) != b"\n":
+                        line = b"\n" + line
+                journal_file.write(line)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+    def read(self) -> List[Dict]:
+        """Return the records of the run, in the order they were written.
+
+        A line that does not parse, such as one cut short by a crash, is skipped.
+
+        Returns:
+            List[Dict]: The records of the run.
+        """
+        records = []
+        if self.run_id is None:
+            return records
+        try:
+            with open(self.path, encoding="utf-8") as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if (
+                        entry.get("job") == self.job_id
+                        and entry.get("run") == self.run_id
+                    ):
+                        records.append(entry)
+        except FileNotFoundError:
+            pass
+        return records
+
+    def replay(self, task_results: List[Dict]) -> int:
+        """Apply the recorded transitions of the run to its task results.
+
+        Args:
+            task_results (List[Dict]): The task results to update in place.
+
+        Returns:
+            int: The number of transitions applied.
+        """
+        applied = 0
+        for entry in self.read():
+            task_index = entry.get("task")
+            if not isinstance(task_index, int) or not (
+                0 <= task_index < len(task_results)
+            ):
+                continue
+            task_results[task_index].update(entry.get("changes", {}))
+            applied += 1
+        if applied:
+            logger.debug(f"Replayed {applied} task transitions from {self.path}")
+        return applied
@@ -0,0 +1,147 @@
+"""Concurrent scheduling of Buddy tasks for the Boss."""
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from miniboss.logs import logger
+
+
+def topological_order(dependencies: Dict[int, Iterable[int]]) -> List[int]:
+    """Order tasks so that every task comes after the tasks it depends on.
+
+    Dependencies on tasks that are not keys of `dependencies` are ignored. Tasks
+    that are ready at the same time keep their index order.
+
+    Args:
+        dependencies (Dict[int, Iterable[int]]): The task indices each task depends on.
+
+    Returns:
+        List[int]: The task indices in dependency order.
+
+    Raises:
+        ValueError: If the dependencies contain a cycle.
+    """
+    remaining = {
+        i: {dep for dep in deps if dep in dependencies}
+        for i, deps in dependencies.items()
+    }
+    order = []
+    placed = set()
+    while remaining:
+        ready = sorted(i for i, deps in remaining.items() if deps <= placed)
+        if not ready:
+            raise ValueError(
+                f"Task dependencies contain a cycle between tasks {sorted(remaining)}"
+            )
+        for i in ready:
+            order.append(i)
+            placed.add(i)
+            del remaining[i]
+    return order
+
+
+class BuddyScheduler:
+    """Runs Buddy tasks at the same time, up to a concurrency cap.
+
+    Tasks form a dependency graph: a task is started as soon as every task it
+    depends on has finished, so only genuinely dependent tasks wait on their
+    predecessors. Each Buddy spends most of its life blocked on an Auto-GPT
+    subprocess, so a thread per running Buddy is enough to overlap their
+    wall-clock time.
+
+    Attributes:
+        max_workers (int): The maximum number of Buddies running at the same time.
+    """
+
+    def __init__(self, max_workers: int = 1) -> None:
+        """Initialize the BuddyScheduler.
+
+        Args:
+            max_workers (int): The maximum number of Buddies running at the same time.
+        """
+        self.max_workers = max(1, int(max_workers or 1))
+
+    def run(
+        self,
+        task_indices: Iterable[int],
+        worker: Callable[[int], Any],
+        dependencies: Optional[Dict[int, Iterable[int]]] = None,
+        cancel: Optional[Callable[[], None]] = None,
+    ) -> Dict[int, Any]:
+        """Run `worker` for every task index and collect the results in order.
+
+        A task whose worker raises is logged and recorded as None so that the
+        remaining Buddies keep running. Tasks that depend on it are skipped and
+        recorded as None as well.
+
+        Args:
+            task_indices (Iterable[int]): The indices of the tasks to run.
+            worker (Callable[[int], Any]): The function that runs a single task.
+            dependencies (Dict[int, Iterable[int]], optional): The task indices
+                each task depends on. Defaults to no dependencies.
+            cancel (Callable[[], None], optional): Called on a keyboard interrupt to
+                stop the running workers before the interrupt is raised.
+
+        Returns:
+            Dict[int, Any]: The worker results keyed by task index, in the order
+                the task indices were given.
+
+        Raises:
+            ValueError: If the dependencies contain a cycle.
+        """
+        task_indices = list(task_indices)
+        if not task_indices:
+            return {}
+        if dependencies is None:
+            dependencies = {}
+
+        order = topological_order({i: dependencies.get(i, ()) for i in task_indices})
+        waiting_on = {
+            i: set(dependencies.get(i, ())) & set(task_indices) for i in task_indices
+        }
+        results = {}
+        finished = set()
+        failed = set()
+        running = {}
+
+        pool_size = min(self.max_workers, len(task_indices))
+        with ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="buddy"
+        ) as executor:
+
+            def submit_ready():
+                # Walking in dependency order lets a skipped task skip its
+                # dependents in the same pass
+                for i in order:
+                    if i not in waiting_on or not waiting_on[i] <= finished:
+                        continue
+                    if waiting_on.pop(i) & failed:
+                        logger.warn(f"Skipping Buddy-{i}: a task it depends on failed")
+                        results[i] = None
+                        failed.add(i)
+                        finished.add(i)
+                    else:
+                        running[executor.submit(worker, i)] = i
+
+            try:
+                submit_ready()
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        i = running.pop(future)
+                        try:
+                            results[i] = future.result()
+                        except Exception as e:
+                            logger.error(f"Buddy-{i} failed: ", str(e))
+                            results[i] = None
+                            failed.add(i)
+                        finished.add(i)
+                    submit_ready()
+            except KeyboardInterrupt:
+                # Leaving the executor waits for the running workers, stop them first
+                waiting_on.clear()
+                if cancel is not None:
+                    cancel()
+                raise
+        return {i: results[i] for i in task_indices}
@@ -0,0 +1,191 @@
+"""Scorers that turn a Buddy's feedback into a performance grade."""
+from __future__ import annotations
+
+import abc
+import functools
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+from miniboss.logs import logger
+from miniboss.singleton import AbstractSingleton
+
+try:
+    from transformers import pipeline
+except ImportError:
+    pipeline = None
+
+# List of supported performance scorers
+supported_scorers = ["regex"]
+if pipeline is not None:
+    supported_scorers.append("huggingface")
+
+SCORE_PATTERN = re.compile(r"\b\d{1,2}\b")
+
+
+class PerformanceScorer(AbstractSingleton):
+    @abc.abstractmethod
+    def score_batch(self, feedbacks: List[str]) -> List[float]:
+        """Scores several feedback strings at once"""
+        pass
+
+    def score(self, feedback: str) -> float:
+        """
+        Scores a single feedback string.
+
+        Args:
+            feedback: The feedback received for the worker's performance.
+
+        Returns: The performance score, normalized to a scale of 0-1.
+        """
+        return self.score_batch([feedback])[0]
+
+    def warm_up(self) -> None:
+        """Loads anything the scorer needs ahead of the first evaluation"""
+        pass
+
+
+class RegexScorer(PerformanceScorer):
+    """A scorer that reads a 0-10 rating out of the feedback text."""
+
+    def score_batch(self, feedbacks: List[str]) -> List[float]:
+        """
+        Scores each feedback string by the first one or two digit number in it.
+
+        Args:
+            feedbacks: The feedback received for the workers' performance.
+
+        Returns: The performance scores, normalized to a scale of 0-1.
+        """
+        return [self._score_text(feedback) for feedback in feedbacks]
+
+    @staticmethod
+    def _score_text(feedback: str) -> float:
+        score_search = SCORE_PATTERN.search(feedback)
+        if score_search:
+            # normalize to a scale of 0-1
+            return float(score_search.group()) / 10
+        # if no score was found in the feedback, handle accordingly
+        return 0.20
+
+
+class HuggingFaceScorer(PerformanceScorer):
+    """
+    A scorer backed by a Hugging Face sentiment-analysis pipeline.
+
+    The pipeline is loaded once per process, on first use or on warm_up().
+    Feedback strings that arrive from concurrent Buddies within batch_window
+    seconds of each other are scored in a single forward pass.
+    """
+
+    def __init__(self, batch_window: float = 0.05) -> None:
+        """
+        Initializes the Hugging Face scorer.
+
+        Args:
+            batch_window: How long, in seconds, to wait for other feedback
+                strings to batch with.
+
+        Returns: None
+        """
+        self.batch_window = batch_window
+        self._pipeline = None
+        self._pipeline_lock = threading.Lock()
+        self._pending = []
+        self._pending_lock = threading.Lock()
+
+    def get_pipeline(self):
+        """
+        Returns the sentiment-analysis pipeline, loading it on first use.
+        """
+        with self._pipeline_lock:
+            if self._pipeline is None:
+                logger.debug("Loading the sentiment-analysis pipeline")
+                self._pipeline = pipeline("sentiment-analysis")
+        return self._pipeline
+
+    def warm_up(self) -> None:
+        """Loads the sentiment-analysis pipeline"""
+        self.get_pipeline()
+
+    def score_batch(self, feedbacks: List[str]) -> List[float]:
+        """
+        Scores the feedback strings in one forward pass of the pipeline.
+
+        Args:
+            feedbacks: The feedback received for the workers' performance.
+
+        Returns: The performance scores, normalized to a scale of 0-1.
+        """
+        if not feedbacks:
+            return []
+        hf_analysis = self.get_pipeline()(list(feedbacks), truncation=True)
+        if len(hf_analysis) != len(feedbacks):
+            # If no score was found in the feedback, handle accordingly
+            return RegexScorer().score_batch(feedbacks)
+        return [analysis["score"] for analysis in hf_analysis]
+
+    def score(self, feedback: str) -> float:
+        """
+        Scores a single feedback string, batching it with any feedback that
+        other Buddies submit at the same time.
+
+        Args:
+            feedback: The feedback received for the worker's performance.
+
+        Returns: The performance score, normalized to a scale of 0-1.
+        """
+        future = Future()
+        with self._pending_lock:
+            self._pending.append((feedback, future))
+            is_leader = len(self._pending) == 1
+
+        if is_leader:
+            if self.batch_window > 0:
+                time.sleep(self.batch_window)
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            try:
+                scores = self.score_batch([text for text, _ in batch])
+                for (_, pending_future), score in zip(batch, scores):
+                    pending_future.set_result(score)
+            except Exception as e:
+                for _, pending_future in batch:
+                    pending_future.set_exception(e)
+
+        return future.result()
+
+
+@functools.lru_cache(maxsize=None)
+def warn_transformers_missing() -> None:
+    """Warns, once per process, that the huggingface scorer is not available."""
+    logger.warn(
+        "Error: transformers is not installed. Please install transformers"
+        " to use the huggingface performance scorer. Falling back to regex."
+    )
+
+
+def get_scorer(cfg) -> PerformanceScorer:
+    """
+    Returns the process-wide performance scorer selected in the config.
+
+    Falls back to the regex scorer when transformers is not installed, warning
+    about it the first time.
+
+    Args:
+        cfg: The config object.
+
+    Returns: The performance scorer.
+    """
+    if cfg.performance_scorer == "huggingface":
+        if pipeline is None:
+            warn_transformers_missing()
+        else:
+            return HuggingFaceScorer()
+    return RegexScorer()
+
+
+def get_supported_scorers():
+    return supported_scorers
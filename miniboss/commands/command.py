@@ -1,11 +1,15 @@
 import functools
 import importlib
 import inspect
+import itertools
 from typing import Any, Callable, Optional
 
 # Unique identifier for mini-boss commands
 MINIBOSS_COMMAND_IDENTIFIER = "miniboss_command"
 
+# Hands out a token to each command registry
+_registry_tokens = itertools.count()
+
 
 class Command:
     """A class representing a command.
@@ -51,6 +55,12 @@ class CommandRegistry:
 
     def __init__(self):
         self.commands = {}
+        # Unique for the life of the process, unlike id(), which is reused once the
+        # registry is garbage collected
+        self.token = next(_registry_tokens)
+        # Changes whenever a command is registered or unregistered, so that
+        # prompts listing the commands know to render them again
+        self.version = 0
 
     def _import_module(self, module_name: str) -> Any:
         return importlib.import_module(module_name)
@@ -60,10 +70,12 @@ class CommandRegistry:
 
     def register(self, cmd: Command) -> None:
         self.commands[cmd.name] = cmd
+        self.version += 1
 
     def unregister(self, command_name: str):
         if command_name in self.commands:
             del self.commands[command_name]
+            self.version += 1
         else:
             raise KeyError(f"Command '{command_name}' not found in registry.")
 
@@ -4,6 +4,8 @@ A module that contains the BossConfig class object that contains the configurati
 """
 from __future__ import annotations
 
+import hashlib
+import json
 import os
 import platform
 from pathlib import Path
@@ -12,6 +14,7 @@ from typing import Optional, Type
 import distro
 import yaml
 
+from miniboss.config.persistence import ResultStore, atomic_write_yaml
 from miniboss.prompts.generator import PromptGenerator
 
 # Soon this will go in a folder where it remembers more stuff about the run(s)
@@ -30,6 +33,9 @@ class BossConfig:
         ai_tasks (list): The list of objectives the AI is supposed to complete.
         target_percentage (float): The value required of the workers performance
         complete_percentage (float): The value required of the workers performance
+        ai_task_dependencies (list): For each task, the indices of the tasks it
+          depends on. None (or a missing entry) keeps the default dependencies.
+        run_id (str): The id of the run the task results belong to.
     """
 
     def __init__(
@@ -42,6 +48,8 @@ class BossConfig:
         ai_task_results: list | None = None,
         target_percentage: float = 0.8,
         complete_percentage: float = 0.0,
+        ai_task_dependencies: list | None = None,
+        run_id: str = "",
     ) -> None:
         """
         Initialize a class instance
@@ -52,6 +60,9 @@ class BossConfig:
             ai_job (list): The list of objectives the AI is supposed to complete.
             ai_tasks (list): The list of objectives the AI is supposed to complete.
             api_budget (float): The maximum dollar value for API calls (0.0 means infinite)
+            ai_task_dependencies (list): For each task, the indices of the tasks it
+              depends on.
+            run_id (str): The id of the run the task results belong to.
         Returns:
             None
         """
@@ -67,8 +78,12 @@ class BossConfig:
         self.api_budget = api_budget
         self.target_percentage = target_percentage
         self.complete_percentage = complete_percentage
+        self.ai_task_dependencies = ai_task_dependencies
+        self.run_id = run_id
         self.prompt_generator = None
         self.command_registry = None
+        # The digest and offset of the results already in the result store
+        self._stored_results = {}
 
     @staticmethod
     def load(config_file: str = SAVE_FILE) -> "BossConfig":
@@ -99,8 +114,10 @@ class BossConfig:
         api_budget = config_params.get("api_budget", 0.0)
         target_percentage = config_params.get("target_percentage", 0.8)
         complete_percentage = config_params.get("complete_percentage", 0.0)
+        ai_task_dependencies = config_params.get("ai_task_dependencies")
+        run_id = config_params.get("run_id", "")
         # type: Type[BossConfig]
-        return BossConfig(
+        config = BossConfig(
             ai_name,
             ai_role,
             ai_job,
@@ -109,7 +126,11 @@ class BossConfig:
             ai_task_results,
             target_percentage,
             complete_percentage,
+            ai_task_dependencies,
+            run_id,
         )
+        config.load_task_results(config_file)
+        return config
 
     def save(self, config_file: str = SAVE_FILE) -> None:
         """
@@ -128,13 +149,139 @@ class BossConfig:
             "ai_role": self.ai_role,
             "ai_job": self.ai_job,
             "ai_tasks": self.ai_tasks,
-            "ai_task_results": self.ai_task_results,
+            "ai_task_results": self._dump_task_results(config_file),
             "api_budget": self.api_budget,
             "target_percentage": self.target_percentage,
             "complete_percentage": self.complete_percentage,
         }
-        with open(config_file, "w", encoding="utf-8") as file:
-            yaml.dump(config, file, allow_unicode=True)
+        if self.ai_task_dependencies is not None:
+            config["ai_task_dependencies"] = self.ai_task_dependencies
+        if self.run_id:
+            config["run_id"] = self.run_id
+        atomic_write_yaml(config, config_file)
+
+    def _dump_task_results(self, config_file: str) -> list:
+        """
+        Returns the task results to save in the yaml file. The results of each
+        task are appended to the result store next to the yaml file the first
+        time they are saved, and the yaml only keeps their offset.
+
+        Parameters:
+            config_file(str): The path to the config yaml file.
+
+        Returns:
+            task_results (list): The task results without their results payload.
+        """
+        store = ResultStore.for_config_file(config_file)
+        task_results = []
+        unstored = []
+        for i, results in enumerate(self.ai_task_results):
+            entry = {key: value for key, value in results.items() if key != "results"}
+            task_results.append(entry)
+            if not results.get("results"):
+                entry["results"] = []
+                continue
+            record = json.dumps(results["results"], ensure_ascii=False)
+            digest = hashlib.sha256(record.encode("utf-8")).digest()
+            stored = self._stored_results.get((store.path, i))
+            if stored is not None and stored[0] == digest:
+                entry["results_offset"] = stored[1]
+            else:
+                unstored.append((i, entry, record, digest))
+        if unstored:
+            offsets = store.append([record for _, _, record, _ in unstored])
+            for (i, entry, _, digest), offset in zip(unstored, offsets):
+                entry["results_offset"] = offset
+                self._stored_results[(store.path, i)] = (digest, offset)
+        return task_results
+
+    def store_task_results(self, i: int, config_file: str) -> dict:
+        """
+        Appends the results of a task to the result store, unless they are
+        already stored, and returns where they are.
+
+        Parameters:
+            i (int): The index of the task.
+            config_file(str): The path to the config yaml file.
+
+        Returns:
+            location (dict): The `results_offset` and `results_digest` of the
+              results, both None if the task has no results.
+        """
+        results = self.ai_task_results[i].get("results")
+        if not results:
+            return {"results": [], "results_offset": None, "results_digest": None}
+        store = ResultStore.for_config_file(config_file)
+        record = json.dumps(results, ensure_ascii=False)
+        digest = hashlib.sha256(record.encode("utf-8")).digest()
+        stored = self._stored_results.get((store.path, i))
+        if stored is None or stored[0] != digest:
+            stored = (digest, store.append([record])[0])
+            self._stored_results[(store.path, i)] = stored
+        return {"results_offset": stored[1], "results_digest": digest.hex()}
+
+    def load_task_results(self, config_file: str) -> None:
+        """
+        Reads the results of each task that has a `results_offset` back from the
+        result store. Results that do not match their `results_digest` are
+        dropped.
+
+        Parameters:
+            config_file(str): The path to the config yaml file.
+
+        Returns:
+            None
+        """
+        store = ResultStore.for_config_file(config_file)
+        for i, results in enumerate(self.ai_task_results):
+            offset = results.pop("results_offset", None)
+            expected_digest = results.pop("results_digest", None)
+            if offset is None:
+                continue
+            try:
+                results["results"] = store.read(offset)
+            except (OSError, ValueError):
+                results["results"] = []
+                continue
+            record = json.dumps(results["results"], ensure_ascii=False)
+            digest = hashlib.sha256(record.encode("utf-8")).digest()
+            if expected_digest is not None and digest.hex() != expected_digest:
+                results["results"] = []
+                continue
+            self._stored_results[(store.path, i)] = (digest, offset)
+
+    def get_task_dependencies(self, independent_by_default: bool = False) -> dict:
+        """
+        Returns the dependency graph of the tasks.
+
+        Tasks without declared dependencies depend on the task before them, which
+        keeps the original one-after-another pipeline, unless
+        independent_by_default is set.
+
+        Parameters:
+            independent_by_default (bool): Whether tasks without declared
+              dependencies are independent of every other task.
+
+        Returns:
+            dependencies (dict): The indices of the tasks each task depends on,
+              keyed by task index.
+
+        Raises:
+            ValueError: If a task depends on itself or on a task that does not exist.
+        """
+        declared = self.ai_task_dependencies or []
+        dependencies = {}
+        for i in range(len(self.ai_tasks)):
+            task_dependencies = declared[i] if i < len(declared) else None
+            if task_dependencies is None:
+                task_dependencies = [] if independent_by_default or i == 0 else [i - 1]
+            for dependency in task_dependencies:
+                if dependency == i or not 0 <= dependency < len(self.ai_tasks):
+                    raise ValueError(
+                        f"Task {i} has an invalid dependency on task {dependency}"
+                    )
+            dependencies[i] = list(task_dependencies)
+        return dependencies
 
     def construct_full_prompt(
         self, prompt_generator: Optional[PromptGenerator] = None
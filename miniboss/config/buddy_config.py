@@ -7,7 +7,7 @@ from __future__ import annotations
 import os
 import platform
 from pathlib import Path
-from typing import Optional, Type
+from typing import Optional, Tuple, Type
 
 import distro
 import yaml
@@ -126,35 +126,75 @@ class BuddyConfig:
         """
         Returns a prompt to the user with the class information in an organized fashion.
 
+        The part of the prompt built with the default prompt generator, which lists
+        the constraints, commands, resources and performance evaluations, is the
+        same for every Buddy. It is cached, and only built again when the
+        registered commands or the plugins change. The header that names the
+        Buddy and its goals is built every time.
+
         Parameters:
-            None
+            prompt_generator (PromptGenerator, optional): The prompt generator to
+              build the prompt with. Defaults to the default prompt generator.
 
         Returns:
             full_prompt (str): A string containing the initial prompt for the user
               including the ai_name, ai_role, ai_job, ai_goals, and api_budget.
         """
-
-        prompt_start = (
-            "Your decisions must always be made independently without"
-            " seeking user assistance. Play to your strengths as an LLM."
-            ""
-        )
-
         from miniboss.config import Config
-        from miniboss.prompts.prompt import build_default_prompt_generator
+        from miniboss.prompts.cache import prompt_cache
 
         cfg = Config()
-        if prompt_generator is None:
-            prompt_generator = build_default_prompt_generator()
+        if prompt_generator is not None:
+            self._set_buddy_fields(prompt_generator)
+            prompt_generator = self._apply_plugins(prompt_generator)
+            self.prompt_generator = prompt_generator
+            return self._render_header(prompt_generator) + (
+                prompt_generator.generate_prompt_string()
+            )
+
+        key = prompt_cache.key({}, self.command_registry, cfg.plugins)
+        prompt_string, shared_generator = prompt_cache.get(
+            key, self._render_shared_prompt
+        )
+        # The cached generator is shared by every Buddy, so each config gets its
+        # own copy
+        prompt_generator = shared_generator.copy()
+        self._set_buddy_fields(prompt_generator)
+        self.prompt_generator = prompt_generator
+        return self._render_header(prompt_generator) + prompt_string
+
+    def _set_buddy_fields(self, prompt_generator: PromptGenerator) -> None:
         prompt_generator.tasks = self.ai_goals
         prompt_generator.name = self.ai_name
         prompt_generator.role = self.ai_role
+
+    def _apply_plugins(self, prompt_generator: PromptGenerator) -> PromptGenerator:
+        from miniboss.config import Config
+
+        cfg = Config()
         prompt_generator.command_registry = self.command_registry
         for plugin in cfg.plugins:
             if not plugin.can_handle_post_prompt():
                 continue
             prompt_generator = plugin.post_prompt(prompt_generator)
+        return prompt_generator
+
+    def _render_shared_prompt(self) -> Tuple[str, PromptGenerator]:
+        from miniboss.prompts.prompt import build_default_prompt_generator
+
+        prompt_generator = self._apply_plugins(build_default_prompt_generator())
+        return prompt_generator.generate_prompt_string(), prompt_generator
+
+    def _render_header(self, prompt_generator: PromptGenerator) -> str:
+        prompt_start = (
+            "Your decisions must always be made independently without"
+            " seeking user assistance. Play to your strengths as an LLM."
+            ""
+        )
 
+        from miniboss.config import Config
+
+        cfg = Config()
         if cfg.execute_local_commands:
             # add OS info to prompt
             os_name = platform.system()
@@ -173,6 +213,4 @@ class BuddyConfig:
             full_prompt += f"{i+1}. {task}\n"
         if self.api_budget > 0.0:
             full_prompt += f"\nIt takes money to let you run. Your API budget is ${self.api_budget:.3f}"
-        self.prompt_generator = prompt_generator
-        full_prompt += f"\n\n{prompt_generator.generate_prompt_string()}"
-        return full_prompt
+        return full_prompt + "\n\n"
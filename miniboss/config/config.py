@@ -35,16 +35,54 @@ class Config(metaclass=Singleton):
         self.buddy_settings_file = os.getenv(
             "BUDDY_SETTINGS_FILE", "buddy_settings.yaml"
         )
+        self.boss_save_debounce = float(os.getenv("BOSS_SAVE_DEBOUNCE", 1.0))
+        self.max_workers = int(os.getenv("MAX_WORKERS", 1))
+        self.buddy_timeout = float(os.getenv("BUDDY_TIMEOUT", 0))
+        self.buddy_idle_timeout = float(os.getenv("BUDDY_IDLE_TIMEOUT", 0))
+        self.performance_scorer = os.getenv("PERFORMANCE_SCORER", "huggingface")
+        self.warm_up_performance_scorer = (
+            os.getenv("WARM_UP_PERFORMANCE_SCORER", "False") == "True"
+        )
         self.fast_llm_model = os.getenv("FAST_LLM_MODEL", "gpt-3.5-turbo")
         self.smart_llm_model = os.getenv("SMART_LLM_MODEL", "gpt-4")
         self.fast_token_limit = int(os.getenv("FAST_TOKEN_LIMIT", 4000))
         self.smart_token_limit = int(os.getenv("SMART_TOKEN_LIMIT", 8000))
+        self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+        self.embedding_tokenizer = os.getenv("EMBEDDING_TOKENIZER", "cl100k_base")
+        self.embedding_token_limit = int(os.getenv("EMBEDDING_TOKEN_LIMIT", 8191))
+        self.embedding_batch_token_limit = int(
+            os.getenv("EMBEDDING_BATCH_TOKEN_LIMIT", 100000)
+        )
+        self.embedding_cache_dir = os.getenv("EMBEDDING_CACHE_DIR", "")
+        self.embedding_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+        self.response_cache = os.getenv("RESPONSE_CACHE", "False") == "True"
+        self.response_cache_path = os.getenv("RESPONSE_CACHE_PATH", "")
+        self.response_cache_size = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))
+        self.response_cache_ttl = float(os.getenv("RESPONSE_CACHE_TTL", 86400))
         self.browse_chunk_max_length = int(os.getenv("BROWSE_CHUNK_MAX_LENGTH", 3000))
+        self.browse_summary_concurrency = int(
+            os.getenv("BROWSE_SUMMARY_CONCURRENCY", 4)
+        )
         self.browse_spacy_language_model = os.getenv(
             "BROWSE_SPACY_LANGUAGE_MODEL", "en_core_web_sm"
         )
 
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        self.openai_requests_per_minute = int(
+            os.getenv("OPENAI_REQUESTS_PER_MINUTE", 0)
+        )
+        self.openai_tokens_per_minute = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", 0))
+        self.openai_max_concurrency = int(os.getenv("OPENAI_MAX_CONCURRENCY", 4))
+        self.openai_max_retries = int(os.getenv("OPENAI_MAX_RETRIES", 10))
+        self.openai_retry_time_budget = float(
+            os.getenv("OPENAI_RETRY_TIME_BUDGET", 120)
+        )
+        self.openai_circuit_breaker_threshold = int(
+            os.getenv("OPENAI_CIRCUIT_BREAKER_THRESHOLD", 5)
+        )
+        self.openai_circuit_breaker_timeout = float(
+            os.getenv("OPENAI_CIRCUIT_BREAKER_TIMEOUT", 60)
+        )
         self.temperature = float(os.getenv("TEMPERATURE", "0"))
         self.use_azure = os.getenv("USE_AZURE") == "True"
         self.execute_local_commands = (
@@ -89,6 +127,7 @@ class Config(metaclass=Singleton):
         self.weaviate_scopes = os.getenv("WEAVIATE_SCOPES", None)
         self.weaviate_embedded_path = os.getenv("WEAVIATE_EMBEDDED_PATH")
         self.weaviate_api_key = os.getenv("WEAVIATE_API_KEY", None)
+        self.weaviate_batch_size = int(os.getenv("WEAVIATE_BATCH_SIZE", 100))
         self.use_weaviate_embedded = (
             os.getenv("USE_WEAVIATE_EMBEDDED", "False") == "True"
         )
@@ -128,7 +167,18 @@ class Config(metaclass=Singleton):
         self.redis_host = os.getenv("REDIS_HOST", "localhost")
         self.redis_port = os.getenv("REDIS_PORT", "6379")
         self.redis_password = os.getenv("REDIS_PASSWORD", "")
+        self.redis_max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", 16))
         self.wipe_redis_on_start = os.getenv("WIPE_REDIS_ON_START", "True") == "True"
+        self.wipe_local_memory_on_start = (
+            os.getenv("WIPE_LOCAL_MEMORY_ON_START", "False") == "True"
+        )
+        self.memory_embedding_dtype = os.getenv("MEMORY_EMBEDDING_DTYPE", "float32")
+        self.local_memory_ann = os.getenv("LOCAL_MEMORY_ANN", "")
+        self.local_memory_ann_min_size = int(
+            os.getenv("LOCAL_MEMORY_ANN_MIN_SIZE", 50000)
+        )
+        self.local_memory_ann_probes = int(os.getenv("LOCAL_MEMORY_ANN_PROBES", 16))
+        self.local_memory_ann_ef = int(os.getenv("LOCAL_MEMORY_ANN_EF", 64))
         self.memory_index = os.getenv("MEMORY_INDEX", "mini-boss")
         # Note that indexes must be created on db 0 in redis, this is not configurable.
 
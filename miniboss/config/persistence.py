@@ -0,0 +1,191 @@
+"""
+A module that contains the helpers used to persist the Boss configuration
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable
+
+import yaml
+
+
+def _get_umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once, since reading the umask briefly changes it for every thread
+UMASK = _get_umask()
+
+
+def atomic_write_yaml(data: Any, file_path: str | Path) -> None:
+    """
+    Writes data to a yaml file through a temporary file and a rename, so the file
+    is never left half written. The file keeps its permissions, and a new file
+    gets the default permissions for the umask.
+
+    Parameters:
+        data (Any): The data to dump.
+        file_path (str | Path): The path to the yaml file.
+
+    Returns:
+        None
+    """
+    file_path = Path(file_path)
+    try:
+        mode = file_path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~UMASK
+    file_descriptor, temp_path = tempfile.mkstemp(
+        prefix=f".{file_path.name}.", suffix=".tmp", dir=file_path.parent
+    )
+    try:
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+            yaml.dump(data, file, allow_unicode=True)
+            file.flush()
+            os.fsync(file.fileno())
+        # mkstemp creates the file readable by its owner only
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class ResultStore:
+    """
+    An append-only JSON-lines file that keeps the task results out of the
+    settings yaml. The yaml stores the byte offset of each task's record.
+
+    Attributes:
+        path (Path): The path to the store.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """
+        Initialize a class instance
+
+        Parameters:
+            path (str | Path): The path to the store.
+        Returns:
+            None
+        """
+        self.path = Path(path)
+
+    @staticmethod
+    def for_config_file(config_file: str | Path) -> "ResultStore":
+        """
+        Returns the store kept next to a settings yaml file.
+
+        Parameters:
+            config_file (str | Path): The path to the settings yaml file.
+
+        Returns:
+            store (ResultStore): The result store.
+        """
+        config_file = Path(config_file)
+        return ResultStore(config_file.with_name(f"{config_file.stem}.results.jsonl"))
+
+    def append(self, records: list[str]) -> list[int]:
+        """
+        Appends serialized results to the store in a single write.
+
+        Parameters:
+            records (list[str]): The results, each serialized to one JSON line.
+
+        Returns:
+            offsets (list[int]): The offset of each record in the store.
+        """
+        offsets = []
+        with open(self.path, "ab") as file:
+            offset = file.seek(0, os.SEEK_END)
+            data = bytearray()
+            for record in records:
+                offsets.append(offset + len(data))
+                data += record.encode("utf-8") + b"\n"
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        return offsets
+
+    def read(self, offset: int) -> list:
+        """
+        Reads the results stored at an offset.
+
+        Parameters:
+            offset (int): The offset of the record.
+
+        Returns:
+            results (list): The stored results.
+        """
+        with open(self.path, "rb") as file:
+            file.seek(offset)
+            return json.loads(file.readline())
+
+
+class DebouncedSaver:
+    """
+    Coalesces save requests that arrive within a debounce window into a
+    single save, and saves anything still pending when the process exits.
+
+    Attributes:
+        delay (float): The debounce window in seconds. 0 saves on every request.
+    """
+
+    def __init__(self, save: Callable[[], None], delay: float = 1.0) -> None:
+        """
+        Initialize a class instance
+
+        Parameters:
+            save (Callable[[], None]): The function that saves.
+            delay (float): The debounce window in seconds.
+        Returns:
+            None
+        """
+        self.delay = delay
+        self._save = save
+        self._lock = threading.RLock()
+        self._timer = None
+        self._pending = False
+        atexit.register(self.flush)
+
+    def request(self) -> None:
+        """
+        Requests a save, which happens once the debounce window has passed.
+
+        Returns:
+            None
+        """
+        if self.delay <= 0:
+            with self._lock:
+                self._pending = True
+            self.flush()
+            return
+        with self._lock:
+            self._pending = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """
+        Saves right away if a save was requested and not done yet.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            self._pending = False
+            self._save()
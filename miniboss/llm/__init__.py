@@ -1,4 +1,5 @@
 from miniboss.llm.api_manager import ApiManager
+from miniboss.llm.async_client import AsyncLLMClient
 from miniboss.llm.base import (
     ChatModelInfo,
     ChatModelResponse,
@@ -14,12 +15,19 @@ from miniboss.llm.llm_utils import (
     chunked_tokens,
     create_chat_completion,
     get_ada_embedding,
+    get_ada_embeddings,
 )
 from miniboss.llm.modelsinfo import COSTS
-from miniboss.llm.token_counter import count_message_tokens, count_string_tokens
+from miniboss.llm.token_counter import (
+    count_message_tokens,
+    count_string_tokens,
+    count_tokens_batch,
+    count_tokens_per_message,
+)
 
 __all__ = [
     "ApiManager",
+    "AsyncLLMClient",
     "Message",
     "ModelInfo",
     "ChatModelInfo",
@@ -33,8 +41,11 @@ __all__ = [
     "call_ai_function",
     "create_chat_completion",
     "get_ada_embedding",
+    "get_ada_embeddings",
     "chunked_tokens",
     "COSTS",
     "count_message_tokens",
     "count_string_tokens",
+    "count_tokens_batch",
+    "count_tokens_per_message",
 ]
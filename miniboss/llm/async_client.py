@@ -0,0 +1,240 @@
+"""An asyncio client for the OpenAI API, for sending requests concurrently."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+import aiohttp
+import openai
+
+from miniboss.config import Config
+from miniboss.llm.api_manager import ApiManager
+from miniboss.llm.base import Message
+from miniboss.llm.llm_utils import (
+    apply_response_plugins,
+    average_chunk_embeddings,
+    chunk_texts,
+    get_configured_response_cache,
+    get_embedding_kwargs,
+    pack_embedding_batches,
+)
+from miniboss.llm.rate_limiter import estimate_chat_tokens, get_rate_limiter
+from miniboss.llm.response_cache import get_response_key
+from miniboss.llm.retry import get_retry_policy
+
+# The seconds an idle connection is kept open for the next request
+KEEPALIVE_TIMEOUT = 60
+
+
+class AsyncLLMClient:
+    """
+    Sends chat completion and embedding requests on an asyncio event loop.
+
+    The requests share one pool of keep-alive HTTP connections. At most
+    `max_concurrency` of them are sent at the same time, and they are kept under
+    the `OPENAI_REQUESTS_PER_MINUTE` and `OPENAI_TOKENS_PER_MINUTE` limits, which
+    are shared with the synchronous requests of the process, like the retry
+    policy. The client must be used on one event loop, and closed when done:
+
+        async with AsyncLLMClient() as client:
+            summaries = await asyncio.gather(
+                *(client.create_chat_completion(messages) for messages in prompts)
+            )
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None) -> None:
+        """
+        Initialize the AsyncLLMClient.
+
+        Args:
+            max_concurrency (int, optional): The most requests sent at the same
+                time. Defaults to `OPENAI_MAX_CONCURRENCY`.
+        """
+        cfg = Config()
+        self.max_concurrency = max(1, max_concurrency or cfg.openai_max_concurrency)
+        self.rate_limiter = get_rate_limiter(
+            cfg.openai_requests_per_minute, cfg.openai_tokens_per_minute
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> AsyncLLMClient:
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the HTTP connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _open(self) -> None:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency, keepalive_timeout=KEEPALIVE_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def _request(
+        self, estimated_tokens: int, create: Callable[..., Awaitable[Any]], **kwargs
+    ) -> Any:
+        """Send a request once the limits allow it, retrying it with the shared
+        retry policy."""
+        self._open()
+
+        async def send() -> Any:
+            await self.rate_limiter.wait_async(estimated_tokens)
+            async with self._semaphore:
+                context = openai.aiosession.set(self._session)
+                try:
+                    return await create(**kwargs)
+                finally:
+                    openai.aiosession.reset(context)
+
+        return await get_retry_policy(Config()).call_async(send)
+
+    async def create_chat_completion(
+        self,
+        messages: List[Message],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        """
+        Create a chat completion, like `create_chat_completion` in `llm_utils`.
+
+        Args:
+            messages (List[Message]): The messages to send to the chat completion
+            model (str, optional): The model to use. Defaults to None.
+            temperature (float, optional): The temperature to use. Defaults to the
+                configured temperature.
+            max_tokens (int, optional): The max tokens to use. Defaults to None.
+
+        Returns:
+            str: The response from the chat completion
+        """
+        cfg = Config()
+        if temperature is None:
+            temperature = cfg.temperature
+        for plugin in cfg.plugins:
+            if plugin.can_handle_chat_completion(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            ):
+                message = plugin.handle_chat_completion(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                )
+                if message is not None:
+                    return message
+
+        cache = get_configured_response_cache(cfg) if temperature == 0 else None
+        if cache is not None:
+            cache_key = get_response_key(messages, model, temperature, max_tokens)
+            cached_response = cache.get(cache_key)
+            if cached_response is not None:
+                return apply_response_plugins(cfg, cached_response)
+
+        kwargs = {}
+        if cfg.use_azure:
+            kwargs["deployment_id"] = cfg.get_azure_deployment_id_for_model(model)
+        response = await self._request(
+            estimate_chat_tokens(messages, max_tokens),
+            openai.ChatCompletion.acreate,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            api_key=cfg.openai_api_key,
+            **kwargs,
+        )
+        ApiManager().update_cost(
+            response.usage.prompt_tokens, response.usage.completion_tokens, model
+        )
+        resp = response.choices[0].message["content"]
+        if cache is not None:
+            cache.put(cache_key, resp)
+        return apply_response_plugins(cfg, resp)
+
+    async def create_embedding(self, text: str, **kwargs) -> List[float]:
+        """
+        Create an embedding of a text.
+
+        Args:
+            text (str): The text to embed.
+            kwargs: Other arguments to pass to the OpenAI API embedding creation
+                call. Defaults to the configured embedding model.
+
+        Returns:
+            List[float]: The embedding.
+        """
+        return (await self.create_embeddings([text], **kwargs))[0]
+
+    async def create_embeddings(self, texts: List[str], **kwargs) -> List[List[float]]:
+        """
+        Create embeddings for several texts, like `create_embeddings` in
+            `llm_utils`, but sending the requests concurrently.
+
+        Args:
+            texts (List[str]): The texts to embed.
+            kwargs: Other arguments to pass to the OpenAI API embedding creation
+                call. Defaults to the configured embedding model.
+
+        Returns:
+            List[List[float]]: The embedding of each text.
+        """
+        cfg = Config()
+        if not kwargs:
+            kwargs = get_embedding_kwargs(cfg)
+        chunks, chunk_owners = chunk_texts(texts, cfg)
+        batches = list(pack_embedding_batches(chunks, cfg.embedding_batch_token_limit))
+        batch_embeddings = await asyncio.gather(
+            *(
+                self.request_embeddings([chunks[i] for i in batch], **kwargs)
+                for batch in batches
+            )
+        )
+
+        chunk_embeddings = [None] * len(chunks)
+        for batch, embeddings in zip(batches, batch_embeddings):
+            for i, embedding in zip(batch, embeddings):
+                chunk_embeddings[i] = embedding
+        return average_chunk_embeddings(
+            len(texts), chunks, chunk_owners, chunk_embeddings
+        )
+
+    async def request_embeddings(
+        self, chunks: List[List[int]], **kwargs
+    ) -> List[List[float]]:
+        """
+        Embed chunks of tokens in a single OpenAI API call.
+
+        Args:
+            chunks (List[List[int]]): The tokens of each chunk.
+            kwargs: Other arguments to pass to the OpenAI API embedding creation call.
+
+        Returns:
+            List[List[float]]: The embedding of each chunk.
+        """
+        cfg = Config()
+        embedding = await self._request(
+            sum(len(chunk) for chunk in chunks),
+            openai.Embedding.acreate,
+            input=chunks,
+            api_key=cfg.openai_api_key,
+            **kwargs,
+        )
+        ApiManager().update_cost(
+            prompt_tokens=embedding.usage.prompt_tokens,
+            completion_tokens=0,
+            model=cfg.embedding_model,
+        )
+        data = sorted(embedding["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
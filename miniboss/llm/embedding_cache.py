@@ -0,0 +1,277 @@
+"""A persistent, content-addressed cache of embeddings."""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from miniboss.config.persistence import DebouncedSaver
+from miniboss.logs import logger
+
+INDEX_FILE_NAME = "index.json"
+VECTORS_FILE_NAME = "embeddings.f32"
+KEYS_FILE_NAME = "keys.bin"
+DIGEST_SIZE = 32
+# The version of the index file, older indexes are reset
+INDEX_VERSION = 2
+# The seconds new embeddings wait before the index is written to disk
+FLUSH_DELAY = 5.0
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_cache(directory: str, max_entries: int) -> EmbeddingCache:
+    """Return the embedding cache kept in a directory, opening it once."""
+    return EmbeddingCache(directory, max_entries)
+
+
+def get_text_digest(text: str) -> bytes:
+    """Return the sha256 digest a text is cached under."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class ModelEmbeddingCache:
+    """The cached embeddings of one model.
+
+    The vectors live in a memory-mapped float32 matrix with one row per slot, next
+    to a matrix with the sha256 digest of the text in each slot. The index file
+    maps digests to slots, from the least to the most recently used, so the least
+    recently used slot is reused once the cache is full. A slot's digest is
+    checked on every lookup, so a stale index can never return the wrong vector.
+
+    Attributes:
+        directory (Path): The directory the cache files are kept in.
+        max_entries (int): The most embeddings kept.
+        dimension (int): The length of the embeddings.
+    """
+
+    def __init__(self, directory: str | Path, max_entries: int, dimension: int) -> None:
+        """Initialize the ModelEmbeddingCache.
+
+        Args:
+            directory (str | Path): The directory the cache files are kept in.
+            max_entries (int): The most embeddings kept.
+            dimension (int): The length of the embeddings.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.dimension = dimension
+        # digest -> slot, from the least to the most recently used
+        self._entries: OrderedDict[bytes, int] = OrderedDict()
+        self._free_slots: List[int] = []
+        self.dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        index_path = self.directory / INDEX_FILE_NAME
+        try:
+            with open(index_path, encoding="utf-8") as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            index = {}
+        if (
+            index.get("version") != INDEX_VERSION
+            or index.get("dimension") != self.dimension
+            or index.get("max_entries") != self.max_entries
+        ):
+            if index:
+                logger.debug(f"Embedding cache in {self.directory} changed, resetting")
+            index = {}
+            for file_name in (VECTORS_FILE_NAME, KEYS_FILE_NAME):
+                (self.directory / file_name).unlink(missing_ok=True)
+
+        self.vectors = self._open_matrix(
+            VECTORS_FILE_NAME, np.float32, (self.max_entries, self.dimension)
+        )
+        self.keys = self._open_matrix(
+            KEYS_FILE_NAME, np.uint8, (self.max_entries, DIGEST_SIZE)
+        )
+        for hex_digest, slot in index.get("entries", []):
+            self._entries[bytes.fromhex(hex_digest)] = slot
+        used = set(self._entries.values())
+        self._free_slots = [
+            slot for slot in reversed(range(self.max_entries)) if slot not in used
+        ]
+
+    def _open_matrix(self, file_name: str, dtype, shape) -> np.memmap:
+        path = self.directory / file_name
+        mode = "r+" if path.exists() else "w+"
+        return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+    def get(self, digest: bytes) -> Optional[np.ndarray]:
+        """Return the cached embedding of a text digest, if any."""
+        slot = self._entries.get(digest)
+        if slot is None:
+            return None
+        if self.keys[slot].tobytes() != digest:
+            del self._entries[digest]
+            self._free_slots.append(slot)
+            self.dirty = True
+            return None
+        self._entries.move_to_end(digest)
+        self.dirty = True
+        return np.array(self.vectors[slot])
+
+    def put(self, digest: bytes, embedding: List[float]) -> None:
+        """Cache the embedding of a text digest, evicting the least recently
+        used embedding if the cache is full."""
+        slot = self._entries.get(digest)
+        if slot is None:
+            if self._free_slots:
+                slot = self._free_slots.pop()
+            else:
+                _, slot = self._entries.popitem(last=False)
+        # Clear the digest first, so a half written vector is never matched
+        self.keys[slot] = 0
+        self.vectors[slot] = embedding
+        self.keys[slot] = np.frombuffer(digest, dtype=np.uint8)
+        self._entries[digest] = slot
+        self._entries.move_to_end(digest)
+        self.dirty = True
+
+    def flush(self) -> None:
+        """Write the vectors and the index to disk."""
+        self.vectors.flush()
+        self.keys.flush()
+        index = {
+            "version": INDEX_VERSION,
+            "dimension": self.dimension,
+            "max_entries": self.max_entries,
+            "entries": [[digest.hex(), slot] for digest, slot in self._entries.items()],
+        }
+        file_descriptor, temp_path = tempfile.mkstemp(
+            prefix=f".{INDEX_FILE_NAME}.", suffix=".tmp", dir=self.directory
+        )
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as index_file:
+            json.dump(index, index_file)
+        os.replace(temp_path, self.directory / INDEX_FILE_NAME)
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class EmbeddingCache:
+    """A disk-backed embedding cache keyed by model and sha256 of the text.
+
+    Changes are written to disk `flush_delay` seconds after the first of them,
+    together, and when the process exits.
+
+    Attributes:
+        directory (Path): The directory each model's cache is kept in.
+        max_entries (int): The most embeddings kept per model.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        max_entries: int = 10000,
+        flush_delay: float = FLUSH_DELAY,
+    ) -> None:
+        """Initialize the EmbeddingCache.
+
+        Args:
+            directory (str | Path): The directory each model's cache is kept in.
+            max_entries (int): The most embeddings kept per model.
+            flush_delay (float): The seconds changes wait before they are written
+                to disk. 0 writes them right away.
+        """
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._models: Dict[str, ModelEmbeddingCache] = {}
+        self._lock = threading.Lock()
+        self._saver = DebouncedSaver(self.flush, flush_delay)
+
+    def _get_model_cache(
+        self, model: str, dimension: Optional[int] = None
+    ) -> Optional[ModelEmbeddingCache]:
+        cache = self._models.get(model)
+        if cache is not None or dimension is None:
+            if cache is None:
+                cache = self._open_existing(model)
+            return cache
+        cache = ModelEmbeddingCache(
+            self.directory / re.sub(r"[^\w.-]", "_", model), self.max_entries, dimension
+        )
+        self._models[model] = cache
+        return cache
+
+    def _open_existing(self, model: str) -> Optional[ModelEmbeddingCache]:
+        directory = self.directory / re.sub(r"[^\w.-]", "_", model)
+        try:
+            with open(directory / INDEX_FILE_NAME, encoding="utf-8") as index_file:
+                dimension = json.load(index_file)["dimension"]
+        except (OSError, ValueError, KeyError):
+            return None
+        cache = ModelEmbeddingCache(directory, self.max_entries, dimension)
+        self._models[model] = cache
+        return cache
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Return the cached embedding of each text, or None if it is not cached.
+
+        Args:
+            model (str): The embedding model.
+            texts (List[str]): The texts.
+
+        Returns:
+            List[Optional[List[float]]]: The cached embeddings.
+        """
+        with self._lock:
+            cache = self._get_model_cache(model)
+            results = []
+            for text in texts:
+                vector = None if cache is None else cache.get(get_text_digest(text))
+                results.append(None if vector is None else vector.tolist())
+            found = sum(result is not None for result in results)
+            self.hits += found
+            self.misses += len(texts) - found
+        if found:
+            self._saver.request()
+        return results
+
+    def put_many(
+        self, model: str, texts: List[str], embeddings: List[List[float]]
+    ) -> None:
+        """Cache the embeddings of several texts, and request a write to disk.
+
+        Args:
+            model (str): The embedding model.
+            texts (List[str]): The texts.
+            embeddings (List[List[float]]): The embedding of each text.
+        """
+        if not texts:
+            return
+        with self._lock:
+            cache = self._get_model_cache(model, len(embeddings[0]))
+            for text, embedding in zip(texts, embeddings):
+                cache.put(get_text_digest(text), embedding)
+        # Requested outside the lock, the save takes it to flush
+        self._saver.request()
+
+    def flush(self) -> None:
+        """Write the changed model caches to disk."""
+        with self._lock:
+            for cache in self._models.values():
+                if cache.dirty:
+                    cache.flush()
+
+    def get_stats(self) -> dict:
+        """Return the number of cached embeddings per model and the hit rate."""
+        with self._lock:
+            return {
+                "entries": {model: len(cache) for model, cache in self._models.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -1,69 +1,37 @@
 from __future__ import annotations
 
 import functools
-import time
+import os
 from itertools import islice
 from typing import List, Optional
 
 import numpy as np
 import openai
 import tiktoken
-from colorama import Fore, Style
-from openai.error import APIError, RateLimitError, Timeout
+from colorama import Fore
 
 from miniboss.config import Config
 from miniboss.llm.api_manager import ApiManager
 from miniboss.llm.base import Message
+from miniboss.llm.embedding_cache import EmbeddingCache, get_embedding_cache
+from miniboss.llm.providers.openai import OPEN_AI_EMBEDDING_MODELS
+from miniboss.llm.rate_limiter import get_rate_limiter
+from miniboss.llm.response_cache import (
+    ResponseCache,
+    get_response_cache,
+    get_response_key,
+)
+from miniboss.llm.retry import get_retry_policy
 from miniboss.logs import logger
 
 
-def retry_openai_api(
-    num_retries: int = 10,
-    backoff_base: float = 2.0,
-    warn_user: bool = True,
-):
-    """Retry an OpenAI API call.
-
-    Args:
-        num_retries int: Number of retries. Defaults to 10.
-        backoff_base float: Base for exponential backoff. Defaults to 2.
-        warn_user bool: Whether to warn the user. Defaults to True.
-    """
-    retry_limit_msg = f"{Fore.RED}Error: " f"Reached rate limit, passing...{Fore.RESET}"
-    api_key_error_msg = (
-        f"Please double check that you have setup a "
-        f"{Fore.CYAN + Style.BRIGHT}PAID{Style.RESET_ALL} OpenAI API Account. You can "
-        f"read more here: {Fore.CYAN}https://docs.agpt.co/setup/#getting-an-api-key{Fore.RESET}"
-    )
-    backoff_msg = (
-        f"{Fore.RED}Error: API Bad gateway. Waiting {{backoff}} seconds...{Fore.RESET}"
-    )
+def retry_openai_api():
+    """Retry an OpenAI API call with the retry policy shared by every request."""
 
     def _wrapper(func):
         @functools.wraps(func)
         def _wrapped(*args, **kwargs):
-            user_warned = not warn_user
-            num_attempts = num_retries + 1  # +1 for the first attempt
-            for attempt in range(1, num_attempts + 1):
-                try:
-                    return func(*args, **kwargs)
-
-                except RateLimitError:
-                    if attempt == num_attempts:
-                        raise
-
-                    logger.debug(retry_limit_msg)
-                    if not user_warned:
-                        logger.double_check(api_key_error_msg)
-                        user_warned = True
-
-                except APIError as e:
-                    if (e.http_status != 502) or (attempt == num_attempts):
-                        raise
-
-                backoff = backoff_base ** (attempt + 2)
-                logger.debug(backoff_msg.format(backoff=backoff))
-                time.sleep(backoff)
+            return get_retry_policy(Config()).call(func, *args, **kwargs)
 
         return _wrapped
 
@@ -124,13 +92,17 @@ def create_chat_completion(
 
     Returns:
         str: The response from the chat completion
+
+    Raises:
+        CircuitOpenError: If the circuit breaker is open because the API kept failing.
+        openai.error.OpenAIError: The error of the last attempt, if the request
+            failed and was not retried, or its retries were used up. Callers decide
+            whether to pause or abort, see `is_api_unavailable`.
     """
     cfg = Config()
     if temperature is None:
         temperature = cfg.temperature
 
-    num_retries = 10
-    warned_user = False
     logger.debug(
         f"{Fore.GREEN}Creating chat completion with model {model}, temperature {temperature}, max_tokens {max_tokens}{Fore.RESET}"
     )
@@ -149,60 +121,35 @@ def create_chat_completion(
             )
             if message is not None:
                 return message
+    # Only a response with temperature 0 is the same every time
+    cache = get_configured_response_cache(cfg) if temperature == 0 else None
+    if cache is not None:
+        cache_key = get_response_key(messages, model, temperature, max_tokens)
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            logger.debug(f"Using cached chat completion {cache_key}")
+            return apply_response_plugins(cfg, cached_response)
     api_manager = ApiManager()
-    response = None
-    for attempt in range(num_retries):
-        backoff = 2 ** (attempt + 2)
-        try:
-            if cfg.use_azure:
-                response = api_manager.create_chat_completion(
-                    deployment_id=cfg.get_azure_deployment_id_for_model(model),
-                    model=model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                )
-            else:
-                response = api_manager.create_chat_completion(
-                    model=model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                )
-            break
-        except RateLimitError:
-            logger.debug(
-                f"{Fore.RED}Error: ", f"Reached rate limit, passing...{Fore.RESET}"
-            )
-            if not warned_user:
-                logger.double_check(
-                    f"Please double check that you have setup a {Fore.CYAN + Style.BRIGHT}PAID{Style.RESET_ALL} OpenAI API Account. "
-                    + f"You can read more here: {Fore.CYAN}https://docs.agpt.co/setup/#getting-an-api-key{Fore.RESET}"
-                )
-                warned_user = True
-        except (APIError, Timeout) as e:
-            if e.http_status != 502:
-                raise
-            if attempt == num_retries - 1:
-                raise
-        logger.debug(
-            f"{Fore.RED}Error: ",
-            f"API Bad gateway. Waiting {backoff} seconds...{Fore.RESET}",
-        )
-        time.sleep(backoff)
-    if response is None:
-        logger.typewriter_log(
-            "FAILED TO GET RESPONSE FROM OPENAI",
-            Fore.RED,
-            "Auto-GPT has failed to get a response from OpenAI's services. "
-            + f"Try running Auto-GPT again, and if the problem the persists try running it with `{Fore.CYAN}--debug{Fore.RESET}`.",
-        )
-        logger.double_check()
-        if cfg.debug_mode:
-            raise RuntimeError(f"Failed to get response after {num_retries} retries")
-        else:
-            quit(1)
+    retry_policy = get_retry_policy(cfg)
+    kwargs = {}
+    if cfg.use_azure:
+        kwargs["deployment_id"] = cfg.get_azure_deployment_id_for_model(model)
+    response = retry_policy.call(
+        api_manager.create_chat_completion,
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        **kwargs,
+    )
     resp = response.choices[0].message["content"]
+    if cache is not None:
+        cache.put(cache_key, resp)
+    return apply_response_plugins(cfg, resp)
+
+
+def apply_response_plugins(cfg: Config, resp: str) -> str:
+    """Let the plugins that handle responses change a chat completion response."""
     for plugin in cfg.plugins:
         if not plugin.can_handle_on_response():
             continue
@@ -210,6 +157,21 @@ def create_chat_completion(
     return resp
 
 
+def get_configured_response_cache(cfg: Config) -> Optional[ResponseCache]:
+    """Get the chat completion response cache, or None if it is disabled.
+
+    The cache is kept in `RESPONSE_CACHE_PATH`, or in the workspace if that is not set.
+    """
+    if not cfg.response_cache or cfg.response_cache_size <= 0:
+        return None
+    path = cfg.response_cache_path
+    if not path:
+        if not cfg.workspace_path:
+            return None
+        path = os.path.join(cfg.workspace_path, "response_cache.sqlite")
+    return get_response_cache(path, cfg.response_cache_size, cfg.response_cache_ttl)
+
+
 def batched(iterable, n):
     """Batch data into tuples of length n. The last batch may be shorter."""
     # batched('ABCDEFG', 3) --> ABC DEF G
@@ -227,6 +189,10 @@ def chunked_tokens(text, tokenizer_name, chunk_length):
     yield from chunks_iterator
 
 
+# The most inputs the OpenAI API accepts in one embedding request
+EMBEDDING_BATCH_MAX_INPUTS = 2048
+
+
 def get_ada_embedding(text: str) -> List[float]:
     """Get an embedding from the ada model.
 
@@ -236,25 +202,67 @@ def get_ada_embedding(text: str) -> List[float]:
     Returns:
         List[float]: The embedding.
     """
+    return get_ada_embeddings([text])[0]
+
+
+def get_ada_embeddings(texts: List[str]) -> List[List[float]]:
+    """Get embeddings from the ada model for several texts at once.
+
+    Args:
+        texts (List[str]): The texts to embed.
+
+    Returns:
+        List[List[float]]: The embedding of each text.
+    """
     cfg = Config()
     model = cfg.embedding_model
-    text = text.replace("\n", " ")
-
+    texts = [text.replace("\n", " ") for text in texts]
+
+    cache = get_configured_embedding_cache(cfg)
+    if cache is None:
+        return create_embeddings(texts, **get_embedding_kwargs(cfg))
+
+    embeddings = cache.get_many(model, texts)
+    # Embed each missing text once, even if it is repeated
+    missing = list(dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None))
+    if missing:
+        created = create_embeddings(missing, **get_embedding_kwargs(cfg))
+        cache.put_many(model, missing, created)
+        created_by_text = dict(zip(missing, created))
+        embeddings = [
+            created_by_text[text] if embedding is None else embedding
+            for text, embedding in zip(texts, embeddings)
+        ]
+    return embeddings
+
+
+def get_embedding_kwargs(cfg: Config) -> dict:
+    """Get the arguments that select the embedding model in the OpenAI API."""
     if cfg.use_azure:
-        kwargs = {"engine": cfg.get_azure_deployment_id_for_model(model)}
-    else:
-        kwargs = {"model": model}
+        return {"engine": cfg.get_azure_deployment_id_for_model(cfg.embedding_model)}
+    return {"model": cfg.embedding_model}
 
-    embedding = create_embedding(text, **kwargs)
-    return embedding
+
+def get_configured_embedding_cache(cfg: Config) -> Optional[EmbeddingCache]:
+    """Get the embedding cache, or None if it is disabled.
+
+    The cache is kept in `EMBEDDING_CACHE_DIR`, or in the workspace if that is not set.
+    """
+    if cfg.embedding_cache_size <= 0:
+        return None
+    directory = cfg.embedding_cache_dir
+    if not directory:
+        if not cfg.workspace_path:
+            return None
+        directory = os.path.join(cfg.workspace_path, "embedding_cache")
+    return get_embedding_cache(directory, cfg.embedding_cache_size)
 
 
-@retry_openai_api()
 def create_embedding(
     text: str,
     *_,
     **kwargs,
-) -> openai.Embedding:
+) -> List[float]:
     """Create an embedding using the OpenAI API
 
     Args:
@@ -262,34 +270,172 @@ def create_embedding(
         kwargs: Other arguments to pass to the OpenAI API embedding creation call.
 
     Returns:
-        openai.Embedding: The embedding object.
+        List[float]: The embedding.
+    """
+    return create_embeddings([text], **kwargs)[0]
+
+
+def create_embeddings(
+    texts: List[str],
+    *_,
+    **kwargs,
+) -> List[List[float]]:
+    """Create embeddings for several texts using as few OpenAI API calls as possible
+
+    Each text is split into chunks of at most `embedding_token_limit` tokens. The
+    chunks of all the texts are packed into requests of at most
+    `embedding_batch_token_limit` tokens, and the chunk embeddings of each text
+    are averaged, weighted by chunk length. A text without tokens, such as "",
+    gets a vector of zeros.
+
+    Args:
+        texts (List[str]): The texts to embed.
+        kwargs: Other arguments to pass to the OpenAI API embedding creation call.
+
+    Returns:
+        List[List[float]]: The embedding of each text.
     """
     cfg = Config()
-    chunk_embeddings = []
-    chunk_lengths = []
-    for chunk in chunked_tokens(
-        text,
-        tokenizer_name=cfg.embedding_tokenizer,
-        chunk_length=cfg.embedding_token_limit,
-    ):
-        embedding = openai.Embedding.create(
-            input=[chunk],
-            api_key=cfg.openai_api_key,
-            **kwargs,
-        )
-        api_manager = ApiManager()
-        api_manager.update_cost(
-            prompt_tokens=embedding.usage.prompt_tokens,
-            completion_tokens=0,
-            model=cfg.embedding_model,
-        )
-        chunk_embeddings.append(embedding["data"][0]["embedding"])
-        chunk_lengths.append(len(chunk))
-
-    # do weighted avg
-    chunk_embeddings = np.average(chunk_embeddings, axis=0, weights=chunk_lengths)
-    chunk_embeddings = chunk_embeddings / np.linalg.norm(
-        chunk_embeddings
-    )  # normalize the length to one
-    chunk_embeddings = chunk_embeddings.tolist()
-    return chunk_embeddings
+    chunks, chunk_owners = chunk_texts(texts, cfg)
+
+    chunk_embeddings = [None] * len(chunks)
+    for batch in pack_embedding_batches(chunks, cfg.embedding_batch_token_limit):
+        embeddings = request_embeddings([chunks[i] for i in batch], **kwargs)
+        for i, embedding in zip(batch, embeddings):
+            chunk_embeddings[i] = embedding
+
+    return average_chunk_embeddings(len(texts), chunks, chunk_owners, chunk_embeddings)
+
+
+def chunk_texts(texts: List[str], cfg: Config):
+    """Split texts into chunks of at most `embedding_token_limit` tokens.
+
+    Args:
+        texts (List[str]): The texts to split.
+        cfg (Config): The config.
+
+    Returns:
+        Tuple[List[List[int]], List[int]]: The tokens of each chunk, and the index
+            of the text each chunk belongs to.
+    """
+    chunks = []
+    chunk_owners = []
+    for i, text in enumerate(texts):
+        for chunk in chunked_tokens(
+            text,
+            tokenizer_name=cfg.embedding_tokenizer,
+            chunk_length=cfg.embedding_token_limit,
+        ):
+            chunks.append(list(chunk))
+            chunk_owners.append(i)
+    return chunks, chunk_owners
+
+
+def average_chunk_embeddings(
+    text_count: int,
+    chunks: List[List[int]],
+    chunk_owners: List[int],
+    chunk_embeddings: List[List[float]],
+) -> List[List[float]]:
+    """Average the chunk embeddings of each text, weighted by chunk length.
+
+    A text without chunks gets a vector of zeros, as long as the other
+    embeddings, or as the embeddings of the configured model if there are none.
+
+    Args:
+        text_count (int): The number of texts.
+        chunks (List[List[int]]): The tokens of each chunk.
+        chunk_owners (List[int]): The index of the text each chunk belongs to.
+        chunk_embeddings (List[List[float]]): The embedding of each chunk.
+
+    Returns:
+        List[List[float]]: The embedding of each text.
+    """
+    embeddings_per_text = [[] for _ in range(text_count)]
+    lengths_per_text = [[] for _ in range(text_count)]
+    for owner, chunk, embedding in zip(chunk_owners, chunks, chunk_embeddings):
+        embeddings_per_text[owner].append(embedding)
+        lengths_per_text[owner].append(len(chunk))
+
+    if chunk_embeddings:
+        dimensions = len(chunk_embeddings[0])
+    else:
+        dimensions = get_embedding_dimensions(Config().embedding_model)
+    results = []
+    for embeddings, lengths in zip(embeddings_per_text, lengths_per_text):
+        if not embeddings:
+            results.append([0.0] * dimensions)
+            continue
+        # do weighted avg
+        embedding = np.average(embeddings, axis=0, weights=lengths)
+        embedding = embedding / np.linalg.norm(embedding)  # normalize the length to one
+        results.append(embedding.tolist())
+    return results
+
+
+def get_embedding_dimensions(model: str) -> int:
+    """Get the length of the embeddings of a model, that of ada's if it is unknown."""
+    model_info = OPEN_AI_EMBEDDING_MODELS.get(
+        model, OPEN_AI_EMBEDDING_MODELS["text-embedding-ada-002"]
+    )
+    return model_info.embedding_dimensions
+
+
+def pack_embedding_batches(chunks: List[List[int]], token_limit: int):
+    """Group chunks into batches that each fit in one embedding request.
+
+    Args:
+        chunks (List[List[int]]): The tokens of each chunk.
+        token_limit (int): The most tokens in one request.
+
+    Yields:
+        List[int]: The indices of the chunks in the next batch.
+    """
+    batch = []
+    batch_tokens = 0
+    for i, chunk in enumerate(chunks):
+        if batch and (
+            batch_tokens + len(chunk) > token_limit
+            or len(batch) == EMBEDDING_BATCH_MAX_INPUTS
+        ):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(i)
+        batch_tokens += len(chunk)
+    if batch:
+        yield batch
+
+
+@retry_openai_api()
+def request_embeddings(
+    chunks: List[List[int]],
+    *_,
+    **kwargs,
+) -> List[List[float]]:
+    """Embed chunks of tokens in a single OpenAI API call
+
+    Args:
+        chunks (List[List[int]]): The tokens of each chunk.
+        kwargs: Other arguments to pass to the OpenAI API embedding creation call.
+
+    Returns:
+        List[List[float]]: The embedding of each chunk.
+    """
+    cfg = Config()
+    get_rate_limiter(cfg.openai_requests_per_minute, cfg.openai_tokens_per_minute).wait(
+        sum(len(chunk) for chunk in chunks)
+    )
+    embedding = openai.Embedding.create(
+        input=chunks,
+        api_key=cfg.openai_api_key,
+        **kwargs,
+    )
+    api_manager = ApiManager()
+    api_manager.update_cost(
+        prompt_tokens=embedding.usage.prompt_tokens,
+        completion_tokens=0,
+        model=cfg.embedding_model,
+    )
+    data = sorted(embedding["data"], key=lambda item: item["index"])
+    return [item["embedding"] for item in data]
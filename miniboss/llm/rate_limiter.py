@@ -0,0 +1,112 @@
+"""Client-side rate limiting of OpenAI API requests."""
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+import time
+from typing import List, Optional
+
+from miniboss.llm.base import Message
+
+# The API estimates a request's tokens as one per four characters
+CHARACTERS_PER_TOKEN = 4
+
+
+@functools.lru_cache(maxsize=None)
+def get_rate_limiter(requests_per_minute: int, tokens_per_minute: int) -> RateLimiter:
+    """Return the rate limiter shared by every request of this process."""
+    return RateLimiter(requests_per_minute, tokens_per_minute)
+
+
+def estimate_chat_tokens(messages: List[Message], max_tokens: Optional[int]) -> int:
+    """Estimate the tokens a chat completion counts against the rate limit, the way
+    the API does: the characters of the messages over four, plus max_tokens."""
+    characters = sum(
+        len(str(value)) for message in messages for value in message.values()
+    )
+    return characters // CHARACTERS_PER_TOKEN + (max_tokens or 0)
+
+
+class TokenBucket:
+    """A bucket that holds up to `per_minute` units and refills continuously.
+
+    Taking more units than the bucket holds leaves it in debt, and the caller waits
+    until the debt is paid back. Callers are served in the order they take units.
+    Units are never given back, because the API counts the estimated tokens of a
+    request against the limit, not the tokens it used.
+
+    Attributes:
+        per_minute (float): The units added per minute, and the most it holds.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.per_minute = per_minute
+        self._rate = per_minute / 60
+        self._level = per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, amount: float) -> float:
+        """Take units from the bucket.
+
+        Args:
+            amount (float): The units to take, at most a minute's worth.
+
+        Returns:
+            float: The seconds to wait before using them.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(
+                self.per_minute, self._level + (now - self._updated) * self._rate
+            )
+            self._updated = now
+            self._level -= min(amount, self.per_minute)
+            return max(0.0, -self._level / self._rate)
+
+
+class RateLimiter:
+    """Keeps requests under a number of requests and tokens per minute.
+
+    A limit of 0 means no limit. The limiter is thread safe, and is shared by the
+    threads and event loops of the process.
+
+    Attributes:
+        requests (Optional[TokenBucket]): The bucket of requests.
+        tokens (Optional[TokenBucket]): The bucket of tokens.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve a request of some tokens.
+
+        Args:
+            tokens (int): The estimated tokens of the request.
+
+        Returns:
+            float: The seconds to wait before sending it.
+        """
+        delay = 0.0
+        if self.requests is not None:
+            delay = self.requests.take(1)
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.take(tokens))
+        return delay
+
+    def wait(self, tokens: int) -> None:
+        """Block until a request of some tokens can be sent."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self, tokens: int) -> None:
+        """Wait until a request of some tokens can be sent."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
@@ -0,0 +1,168 @@
+"""A persistent cache of deterministic chat completion responses."""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from miniboss.llm.base import Message
+
+
+@functools.lru_cache(maxsize=None)
+def get_response_cache(path: str, max_entries: int, ttl: float) -> ResponseCache:
+    """Return the response cache kept in a database file, opening it once."""
+    return ResponseCache(path, max_entries, ttl)
+
+
+def get_response_key(
+    messages: List[Message],
+    model: Optional[str],
+    temperature: float,
+    max_tokens: Optional[int],
+) -> str:
+    """Return the sha256 a chat completion is cached under.
+
+    The messages are normalized first, so that the order of their keys and the
+    whitespace around their content do not change the key.
+
+    Args:
+        messages (List[Message]): The messages sent to the chat completion.
+        model (Optional[str]): The model.
+        temperature (float): The temperature.
+        max_tokens (Optional[int]): The most tokens of the response.
+
+    Returns:
+        str: The hex digest.
+    """
+    normalized = [
+        {
+            key: value.strip() if key == "content" else value
+            for key, value in sorted(message.items())
+        }
+        for message in messages
+    ]
+    request = {
+        "model": model,
+        "temperature": float(temperature),
+        "max_tokens": max_tokens,
+        "messages": normalized,
+    }
+    data = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """A chat completion response cache in an SQLite database.
+
+    Responses expire `ttl` seconds after they were stored. Once the cache holds more
+    than `max_entries` responses, the least recently used ones are dropped.
+
+    Attributes:
+        path (Path): The database file.
+        max_entries (int): The most responses kept.
+        ttl (float): The seconds a response is kept, 0 to keep it until it is
+            dropped for space.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int, ttl: float) -> None:
+        """Initialize the ResponseCache.
+
+        Args:
+            path (str | Path): The database file.
+            max_entries (int): The most responses kept.
+            ttl (float): The seconds a response is kept.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+        )
+        with self._lock:
+            self._delete_expired()
+            (self._count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()
+
+    def _delete_expired(self) -> None:
+        if self.ttl > 0:
+            self._connection.execute(
+                "DELETE FROM responses WHERE created <= ?", (time.time() - self.ttl,)
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None if there is none or it
+        expired."""
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl > 0 and row[1] <= now - self.ttl):
+                self.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """Cache the response for a key, dropping the least recently used
+        responses if the cache is full."""
+        now = time.time()
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            if cursor.rowcount == 0:
+                self._connection.execute(
+                    "UPDATE responses SET response = ?, created = ?, last_used = ?"
+                    " WHERE key = ?",
+                    (response, now, now, key),
+                )
+                return
+            self._count += 1
+            if self._count > self.max_entries:
+                self._delete_expired()
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses"
+                    " ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                (self._count,) = self._connection.execute(
+                    "SELECT COUNT(*) FROM responses"
+                ).fetchone()
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._count = 0
+
+    def get_stats(self) -> dict:
+        """Return the number of cached responses and the hit rate."""
+        with self._lock:
+            return {"entries": self._count, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,315 @@
+"""The retry policy shared by every OpenAI API request."""
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import functools
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from colorama import Fore, Style
+from openai.error import (
+    APIConnectionError,
+    APIError,
+    RateLimitError,
+    ServiceUnavailableError,
+    Timeout,
+    TryAgain,
+)
+
+from miniboss.config import Config
+from miniboss.logs import logger
+
+# The first backoff, in seconds, doubled on every retry up to the longest backoff
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# The HTTP statuses of API errors that are worth retrying
+RETRYABLE_STATUSES = {500, 502, 503, 504}
+# Errors that mean the API is unavailable, rather than busy, and count against the
+# circuit breaker
+SERVER_ERRORS = (APIConnectionError, ServiceUnavailableError, Timeout, TryAgain)
+
+API_KEY_ERROR_MSG = (
+    f"Please double check that you have setup a "
+    f"{Fore.CYAN + Style.BRIGHT}PAID{Style.RESET_ALL} OpenAI API Account. You can "
+    f"read more here: {Fore.CYAN}https://docs.agpt.co/setup/#getting-an-api-key{Fore.RESET}"
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+
+def is_api_unavailable(error: Exception) -> bool:
+    """Return whether a request failed because the OpenAI API is unavailable or
+    busy, rather than because of the request, once its retries were used up."""
+    return isinstance(error, CircuitOpenError) or RetryPolicy.is_retryable(error)
+
+
+def log_api_unavailable(error: Exception) -> None:
+    """Tell the user that no response could be got from the OpenAI API."""
+    logger.debug(f"{Fore.RED}Error: {error}{Fore.RESET}")
+    logger.typewriter_log(
+        "FAILED TO GET RESPONSE FROM OPENAI",
+        Fore.RED,
+        "Mini-Boss has failed to get a response from OpenAI's services. "
+        + f"Try running Mini-Boss again, and if the problem the persists try running it with `{Fore.CYAN}--debug{Fore.RESET}`.",
+    )
+    logger.double_check()
+
+
+def get_retry_policy(cfg: Config) -> RetryPolicy:
+    """Return the retry policy shared by every request of this process."""
+    return _get_retry_policy(
+        cfg.openai_max_retries,
+        cfg.openai_retry_time_budget,
+        cfg.openai_circuit_breaker_threshold,
+        cfg.openai_circuit_breaker_timeout,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_retry_policy(
+    max_retries: int,
+    time_budget: float,
+    breaker_threshold: int,
+    breaker_timeout: float,
+) -> RetryPolicy:
+    circuit_breaker = (
+        CircuitBreaker(breaker_threshold, breaker_timeout)
+        if breaker_threshold > 0
+        else None
+    )
+    return RetryPolicy(max_retries, time_budget, circuit_breaker)
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Return the seconds the server asked to wait before retrying, if it did.
+
+    Args:
+        error (Exception): The error of the failed request.
+
+    Returns:
+        Optional[float]: The seconds to wait.
+    """
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get("retry-after-ms") or headers.get("Retry-After-Ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class CircuitBreaker:
+    """Stops requests to an API that keeps failing.
+
+    The breaker opens after `failure_threshold` requests in a row failed because
+    the API was unavailable. While it is open, requests fail at once. After
+    `reset_timeout` seconds one request is let through, and closes the breaker
+    again if it succeeds.
+
+    Attributes:
+        failure_threshold (int): The failures in a row that open the breaker.
+        reset_timeout (float): The seconds the breaker stays open.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return (
+                self._opened_at is not None
+                and time.monotonic() - self._opened_at < self.reset_timeout
+            )
+
+    def before_request(self) -> None:
+        """Raise CircuitOpenError if the breaker is open."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining > 0:
+                raise CircuitOpenError(
+                    f"The OpenAI API keeps failing, not retrying for {remaining:.0f}"
+                    " seconds"
+                )
+            # Let this request through, the next ones wait for its outcome
+            self._opened_at = time.monotonic()
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warn(
+                        f"OpenAI API failed {self._failures} times in a row, pausing"
+                        f" requests for {self.reset_timeout:.0f} seconds"
+                    )
+                self._opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    """Retries failed OpenAI API requests.
+
+    Rate limited requests, and requests that fail because the API is unavailable,
+    are retried after a backoff. The backoff is drawn at random between 0 and a
+    limit that doubles on every retry, so that clients that failed together do not
+    retry together, unless the server said how long to wait with a Retry-After
+    header. A request is given up after `max_retries` retries, or when waiting
+    for the next retry would take it past `time_budget` seconds, or when the
+    circuit breaker opens.
+
+    Attributes:
+        max_retries (int): The most retries of a request.
+        time_budget (float): The most seconds spent on a request and its retries.
+        circuit_breaker (Optional[CircuitBreaker]): The breaker of the API.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 10,
+        time_budget: float = 120.0,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.max_retries = max_retries
+        self.time_budget = time_budget
+        self.circuit_breaker = circuit_breaker
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """Return whether a request that failed with an error is worth retrying."""
+        if isinstance(error, (RateLimitError,) + SERVER_ERRORS):
+            return True
+        return isinstance(error, APIError) and error.http_status in RETRYABLE_STATUSES
+
+    def get_backoff(self, attempt: int, error: Exception) -> float:
+        """Return the seconds to wait before a retry.
+
+        Args:
+            attempt (int): The number of the attempt that failed, from 1.
+            error (Exception): The error it failed with.
+
+        Returns:
+            float: The seconds to wait.
+        """
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+    def _before_attempt(self) -> None:
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_request()
+
+    def _after_failure(
+        self, error: Exception, attempt: int, start: float, warned_user: bool
+    ) -> float:
+        """Record a failed attempt, and return the seconds to wait before the next
+        one, or raise the error if it should not be retried."""
+        if not self.is_retryable(error):
+            raise error
+        if self.circuit_breaker is not None:
+            if isinstance(error, RateLimitError):
+                # The API is up, just busy
+                self.circuit_breaker.record_success()
+            else:
+                self.circuit_breaker.record_failure()
+                if self.circuit_breaker.is_open:
+                    raise error
+        backoff = self.get_backoff(attempt, error)
+        if (
+            attempt > self.max_retries
+            or time.monotonic() - start + backoff > self.time_budget
+        ):
+            raise error
+
+        if isinstance(error, RateLimitError):
+            logger.debug(
+                f"{Fore.RED}Error: Reached rate limit, retrying in {backoff:.1f}"
+                f" seconds...{Fore.RESET}"
+            )
+            if not warned_user:
+                logger.double_check(API_KEY_ERROR_MSG)
+        else:
+            logger.debug(
+                f"{Fore.RED}Error: {error}. Retrying in {backoff:.1f}"
+                f" seconds...{Fore.RESET}"
+            )
+        return backoff
+
+    def _after_success(self) -> None:
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call a function that sends a request, retrying it when it fails.
+
+        Args:
+            func (Callable): The function.
+            args, kwargs: The arguments to call it with.
+
+        Returns:
+            Any: What the function returned.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open.
+            Exception: The error of the last attempt, if the request was given up.
+        """
+        start = time.monotonic()
+        warned_user = False
+        for attempt in range(1, self.max_retries + 2):
+            self._before_attempt()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                backoff = self._after_failure(error, attempt, start, warned_user)
+                warned_user = warned_user or isinstance(error, RateLimitError)
+                time.sleep(backoff)
+                continue
+            self._after_success()
+            return result
+
+    async def call_async(
+        self, func: Callable[..., Awaitable[Any]], *args, **kwargs
+    ) -> Any:
+        """Await a coroutine function that sends a request, retrying it when it
+        fails. See `call`."""
+        start = time.monotonic()
+        warned_user = False
+        for attempt in range(1, self.max_retries + 2):
+            self._before_attempt()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as error:
+                backoff = self._after_failure(error, attempt, start, warned_user)
+                warned_user = warned_user or isinstance(error, RateLimitError)
+                await asyncio.sleep(backoff)
+                continue
+            self._after_success()
+            return result
@@ -1,42 +1,66 @@
 """Functions for counting the number of tokens in a message or string."""
 from __future__ import annotations
 
-from typing import List
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
 
 import tiktoken
 
 from miniboss.llm.base import Message
 from miniboss.logs import logger
 
+# The number of token counts kept in the cache
+TOKEN_COUNT_CACHE_SIZE = 8192
+# Fewer uncached texts than this are encoded on the calling thread, since
+# encode_batch starts a thread pool per call
+ENCODE_BATCH_MIN_SIZE = 16
 
-def count_message_tokens(
-    messages: List[Message], model: str = "gpt-3.5-turbo-0301"
-) -> int:
+# Every reply is primed with <|start|>assistant<|message|>
+REPLY_PRIMING_TOKENS = 3
+
+# Models that may change over time, and the snapshot they are counted as
+MODEL_ALIASES = {
+    # !Note: gpt-3.5-turbo may change over time.
+    # Returning num tokens assuming gpt-3.5-turbo-0301.")
+    "gpt-3.5-turbo": "gpt-3.5-turbo-0301",
+    # !Note: gpt-4 may change over time. Returning num tokens assuming gpt-4-0314.")
+    "gpt-4": "gpt-4-0314",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
     """
-    Returns the number of tokens used by a list of messages.
+    Returns the tiktoken encoding of a model, loading it once per model.
 
     Args:
-        messages (list): A list of messages, each of which is a dictionary
-            containing the role and content of the message.
-        model (str): The name of the model to use for tokenization.
-            Defaults to "gpt-3.5-turbo-0301".
+        model (str): The name of the model.
 
     Returns:
-        int: The number of tokens used by the list of messages.
+        tiktoken.Encoding: The encoding, cl100k_base if the model is unknown.
     """
     try:
-        encoding = tiktoken.encoding_for_model(model)
+        return tiktoken.encoding_for_model(model)
     except KeyError:
         logger.warn("Warning: model not found. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
-    if model == "gpt-3.5-turbo":
-        # !Note: gpt-3.5-turbo may change over time.
-        # Returning num tokens assuming gpt-3.5-turbo-0301.")
-        return count_message_tokens(messages, model="gpt-3.5-turbo-0301")
-    elif model == "gpt-4":
-        # !Note: gpt-4 may change over time. Returning num tokens assuming gpt-4-0314.")
-        return count_message_tokens(messages, model="gpt-4-0314")
-    elif model == "gpt-3.5-turbo-0301":
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def get_message_overhead(model: str) -> Tuple[int, int]:
+    """
+    Returns the tokens every message and every name add on top of their content.
+
+    Args:
+        model (str): The name of the model.
+
+    Returns:
+        Tuple[int, int]: The tokens per message and the tokens per name.
+    """
+    model = MODEL_ALIASES.get(model, model)
+    if model == "gpt-3.5-turbo-0301":
         tokens_per_message = (
             4  # every message follows <|start|>{role/name}\n{content}<|end|>\n
         )
@@ -50,15 +74,141 @@ def count_message_tokens(
             " See https://github.com/openai/openai-python/blob/main/chatml.md for"
             " information on how messages are converted to tokens."
         )
-    num_tokens = 0
-    for message in messages:
-        num_tokens += tokens_per_message
+    return tokens_per_message, tokens_per_name
+
+
+def encode_batch(texts: List[str], encoding: tiktoken.Encoding) -> List[List[int]]:
+    """
+    Encodes several text strings, in parallel when there are enough of them.
+
+    Args:
+        texts (List[str]): The text strings.
+        encoding (tiktoken.Encoding): The encoding to use.
+
+    Returns:
+        List[List[int]]: The tokens of each text string.
+    """
+    if len(texts) < ENCODE_BATCH_MIN_SIZE:
+        return [encoding.encode(text) for text in texts]
+    return encoding.encode_batch(texts)
+
+
+class TokenCountCache:
+    """An LRU cache of token counts keyed by encoding and content hash."""
+
+    def __init__(self, max_size: int = TOKEN_COUNT_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(encoding: tiktoken.Encoding, text: str) -> Tuple[str, bytes]:
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        return encoding.name, digest
+
+    def count(self, texts: List[str], encoding: tiktoken.Encoding) -> List[int]:
+        """
+        Returns the number of tokens in each text, encoding all the texts that are
+        not cached yet in one batch.
+
+        Args:
+            texts (List[str]): The texts to count.
+            encoding (tiktoken.Encoding): The encoding to count with.
+
+        Returns:
+            List[int]: The number of tokens in each text.
+        """
+        keys = [self.key(encoding, text) for text in texts]
+        counts = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._counts:
+                    self._counts.move_to_end(key)
+                    counts[i] = self._counts[key]
+                else:
+                    missing.setdefault(key, []).append(i)
+        if not missing:
+            return counts
+
+        indices = list(missing.values())
+        encoded = encode_batch([texts[positions[0]] for positions in indices], encoding)
+        with self._lock:
+            for key, positions, tokens in zip(missing, indices, encoded):
+                for i in positions:
+                    counts[i] = len(tokens)
+                self._counts[key] = len(tokens)
+            while len(self._counts) > self.max_size:
+                self._counts.popitem(last=False)
+        return counts
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+token_count_cache = TokenCountCache()
+
+
+def count_tokens_batch(texts: List[str], model: str) -> List[int]:
+    """
+    Returns the number of tokens in each of several text strings.
+
+    Args:
+        texts (List[str]): The text strings.
+        model (str): The name of the model to use for tokenization.
+
+    Returns:
+        List[int]: The number of tokens in each text string.
+    """
+    return token_count_cache.count(texts, get_encoding(model))
+
+
+def count_tokens_per_message(messages: List[Message], model: str) -> List[int]:
+    """
+    Returns the number of tokens each message adds to a list of messages.
+
+    Args:
+        messages (list): A list of messages, each of which is a dictionary
+            containing the role and content of the message.
+        model (str): The name of the model to use for tokenization.
+
+    Returns:
+        List[int]: The tokens of each message, without the tokens that prime the
+            reply.
+    """
+    tokens_per_message, tokens_per_name = get_message_overhead(model)
+    counts = [tokens_per_message] * len(messages)
+    values = []
+    owners = []
+    for i, message in enumerate(messages):
         for key, value in message.items():
-            num_tokens += len(encoding.encode(value))
+            values.append(value)
+            owners.append(i)
             if key == "name":
-                num_tokens += tokens_per_name
-    num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
-    return num_tokens
+                counts[i] += tokens_per_name
+    value_counts = count_tokens_batch(values, MODEL_ALIASES.get(model, model))
+    for i, value_count in zip(owners, value_counts):
+        counts[i] += value_count
+    return counts
+
+
+def count_message_tokens(
+    messages: List[Message], model: str = "gpt-3.5-turbo-0301"
+) -> int:
+    """
+    Returns the number of tokens used by a list of messages.
+
+    Args:
+        messages (list): A list of messages, each of which is a dictionary
+            containing the role and content of the message.
+        model (str): The name of the model to use for tokenization.
+            Defaults to "gpt-3.5-turbo-0301".
+
+    Returns:
+        int: The number of tokens used by the list of messages.
+    """
+    return sum(count_tokens_per_message(messages, model)) + REPLY_PRIMING_TOKENS
 
 
 def count_string_tokens(string: str, model_name: str) -> int:
@@ -72,5 +222,4 @@ def count_string_tokens(string: str, model_name: str) -> int:
     Returns:
         int: The number of tokens in the text string.
     """
-    encoding = tiktoken.encoding_for_model(model_name)
-    return len(encoding.encode(string))
+    return count_tokens_batch([string], model_name)[0]
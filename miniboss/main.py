@@ -7,8 +7,10 @@ Functions:
 
 """
 import logging
+import threading
 
 from miniboss.boss.boss import Boss
+from miniboss.boss.scoring import get_scorer
 from miniboss.config import check_openai_api_key
 from miniboss.configurator import create_config
 from miniboss.memory import get_memory
@@ -84,6 +86,9 @@ def run_miniboss(
     workspace_directory = setup_workspace(cfg, workspace_directory)
     setup_file_logger(cfg, workspace_directory)
     command_registry = setup_plugins_and_commands(cfg)
+    if cfg.warm_up_performance_scorer:
+        # Load the scorer while the Boss is being set up
+        threading.Thread(target=get_scorer(cfg).warm_up, daemon=True).start()
 
     def construct_boss_config(command_registry):
         """Constructs the boss configuration.
@@ -161,7 +166,7 @@ def run_miniboss(
             system_prompt=system_prompt,
             triggering_prompt=DEFAULT_TRIGGERING_PROMPT,
             workspace_directory=workspace_directory,
-            max_workers=1,
+            max_workers=cfg.max_workers,
         )
         boss.set_results_for_tasks()
         boss.start_interaction_loop()
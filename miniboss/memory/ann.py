@@ -0,0 +1,427 @@
+"""Vector search for the local memory backend, exact or approximate."""
+from __future__ import annotations
+
+import abc
+import atexit
+import os
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from miniboss.logs import logger
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# Rows of the memory are assigned to IVF lists in chunks of this many
+ASSIGN_CHUNK_SIZE = 8192
+# k-means iterations when training the IVF lists
+KMEANS_ITERATIONS = 8
+# Rows sampled per IVF list when training
+KMEANS_SAMPLE_PER_LIST = 32
+# The IVF lists are trained again when the memory has grown this many times
+RETRAIN_GROWTH = 4
+# Beyond this many rows, the IVF lists are no longer trained again
+RETRAIN_LIMIT = 1 << 18
+# Quantized rows are dequantized and scored in blocks of this many
+DEQUANTIZE_BLOCK_SIZE = 4096
+# The ways the local memory can store its embeddings
+EMBEDDING_DTYPES = ["float32", "float16", "int8"]
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to a length of one, leaving rows of zeros as they are"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def get_embedding_dtype(cfg) -> str:
+    """
+    Get the type memories store their embeddings as, set by MEMORY_EMBEDDING_DTYPE
+
+    Args:
+        cfg: Config object
+
+    Returns: One of EMBEDDING_DTYPES
+    """
+    dtype = cfg.memory_embedding_dtype.lower()
+    if dtype not in EMBEDDING_DTYPES:
+        logger.warn(f"Unknown MEMORY_EMBEDDING_DTYPE {dtype}, using float32 instead.")
+        return "float32"
+    return dtype
+
+
+def quantize_rows(vectors: np.ndarray, dtype: str):
+    """
+    Convert rows of float32 to the storage type of the memory
+
+        int8 rows are scaled so that their largest component is 127, and keep
+        that scale to be dequantized with.
+
+    Args:
+        vectors: np.ndarray of float32
+        dtype: One of EMBEDDING_DTYPES
+
+    Returns: The converted rows, and the scale of each row for int8 or None
+    """
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        rows = np.rint(vectors / scales[:, np.newaxis]).astype(np.int8)
+        return rows, scales.astype(np.float32)
+    return vectors.astype(dtype), None
+
+
+class QuantizedRows:
+    """
+    Rows stored as float16, or as int8 with a scale per row, that are
+        dequantized to float32 as they are read. Scoring dequantizes a block
+        of rows at a time, so the whole matrix is never held as float32.
+    """
+
+    def __init__(self, rows: np.ndarray, scales: np.ndarray | None = None) -> None:
+        self.rows = rows
+        self.scales = scales
+        self.shape = rows.shape
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, key) -> np.ndarray:
+        rows = self.rows[key].astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales[key][..., np.newaxis]
+        return rows
+
+    def dot(self, queries: np.ndarray) -> np.ndarray:
+        """The dot product of each query with each row"""
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), DEQUANTIZE_BLOCK_SIZE):
+            end = start + DEQUANTIZE_BLOCK_SIZE
+            scores[:, start:end] = queries @ self.rows[start:end].T.astype(np.float32)
+            if self.scales is not None:
+                scores[:, start:end] *= self.scales[start:end]
+        return scores
+
+
+def top_k_indices(
+    matrix: np.ndarray | QuantizedRows,
+    queries: np.ndarray,
+    k: int,
+    min_score: float | None = None,
+) -> List[np.ndarray]:
+    """
+    Find the rows of a matrix with the highest dot product with each query
+
+        The k best rows are selected with np.argpartition, which is O(n), and only
+        those k are sorted.
+
+    Args:
+        matrix: np.ndarray or QuantizedRows with a row per candidate
+        queries: np.ndarray with a row per query
+        k: The number of rows to return per query
+        min_score: The lowest score of a returned row, if any
+
+    Returns: The indices of the best rows for each query, best first
+    """
+    k = min(k, len(matrix))
+    if k <= 0:
+        return [np.empty(0, dtype=np.int64) for _ in queries]
+    if isinstance(matrix, QuantizedRows):
+        scores = matrix.dot(queries)
+    else:
+        scores = queries @ matrix.T
+    if k < len(matrix):
+        candidates = np.argpartition(scores, -k, axis=1)[:, -k:]
+    else:
+        candidates = np.broadcast_to(np.arange(len(matrix)), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1)
+    best = np.take_along_axis(candidates, order, axis=1)
+    best_scores = np.take_along_axis(candidate_scores, order, axis=1)
+    if min_score is None:
+        return list(best)
+    return [row[row_scores >= min_score] for row, row_scores in zip(best, best_scores)]
+
+
+def replace_file(path: Path, write) -> None:
+    """Write a file next to `path` with `write(temp_path)` and rename it over it"""
+    temp_path = path.with_name(f".{path.name}.tmp")
+    write(temp_path)
+    os.replace(temp_path, path)
+
+
+class AnnIndex(abc.ABC):
+    """
+    An approximate nearest neighbour index over the rows of a LocalCache
+
+        The index covers the first `count` rows of the embeddings matrix, and
+        `sync` adds the rows that were appended since.
+    """
+
+    count = 0
+
+    def sync(self, vectors: np.ndarray) -> None:
+        """Index the rows of the matrix that are not indexed yet"""
+        if len(vectors) < self.count:
+            self.reset()
+        if len(vectors) > self.count:
+            self.add(vectors, self.count)
+
+    @abc.abstractmethod
+    def add(self, vectors: np.ndarray, start: int) -> None:
+        """Index the rows of the matrix from `start` on"""
+        pass
+
+    @abc.abstractmethod
+    def search(
+        self,
+        vectors: np.ndarray,
+        queries: np.ndarray,
+        k: int,
+        min_score: float | None = None,
+    ) -> List[np.ndarray]:
+        """Find the rows most similar to each query, like top_k_indices"""
+        pass
+
+    @abc.abstractmethod
+    def reset(self) -> None:
+        """Empty the index"""
+        pass
+
+
+class IVFIndex(AnnIndex):
+    """
+    An inverted file index in pure NumPy
+
+        The rows are clustered around centroids with spherical k-means, and a
+        query is only scored exactly against the rows of the `probes` clusters
+        with the closest centroids. More probes find more of the true nearest
+        rows, at the cost of scoring more of them.
+
+        {index}.ivf_centroids.npy   the centroids, written when they are trained
+        {index}.ivf_lists.bin       the int32 cluster of each row, appended to
+    """
+
+    def __init__(self, workspace_path: Path, index: str, probes: int = 16) -> None:
+        self.centroids_path = workspace_path / f"{index}.ivf_centroids.npy"
+        self.lists_path = workspace_path / f"{index}.ivf_lists.bin"
+        self.probes = probes
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.trained_count = 0
+        self.load()
+
+    def load(self) -> None:
+        try:
+            self.centroids = np.load(self.centroids_path)
+            assignments = np.fromfile(self.lists_path, dtype=np.int32)
+        except (OSError, ValueError):
+            self.reset()
+            return
+        self.assignments = assignments
+        self.count = self.trained_count = len(assignments)
+        self._build_lists()
+
+    def reset(self) -> None:
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.count = self.trained_count = 0
+        self.centroids_path.unlink(missing_ok=True)
+        self.lists_path.unlink(missing_ok=True)
+        self._build_lists()
+
+    def _build_lists(self) -> None:
+        """Sort the rows by cluster, leaving rows added later in a tail"""
+        self._rows = np.argsort(self.assignments, kind="stable")
+        n_lists = 0 if self.centroids is None else len(self.centroids)
+        self._bounds = np.searchsorted(
+            self.assignments[self._rows], np.arange(n_lists + 1)
+        )
+        self._merged = len(self.assignments)
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        assignments = [
+            np.argmax(vectors[i : i + ASSIGN_CHUNK_SIZE] @ self.centroids.T, axis=1)
+            for i in range(0, len(vectors), ASSIGN_CHUNK_SIZE)
+        ]
+        return np.concatenate(assignments).astype(np.int32)
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Cluster the rows and assign every row to its closest centroid"""
+        n_lists = int(np.clip(np.sqrt(len(vectors)), 1, 4096))
+        rng = np.random.default_rng(0)
+        sample_size = min(len(vectors), n_lists * KMEANS_SAMPLE_PER_LIST)
+        sample = np.asarray(
+            vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+        )
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            nearest = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = normalize_rows(sums)
+        logger.debug(f"Trained {n_lists} IVF lists on {sample_size} memories")
+
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = self._assign(vectors)
+        self.count = self.trained_count = len(vectors)
+        replace_file(self.centroids_path, self._save_centroids)
+        replace_file(self.lists_path, self.assignments.tofile)
+        self._build_lists()
+
+    def _save_centroids(self, path: Path) -> None:
+        # np.save adds .npy to a path that does not end with it
+        with open(path, "wb") as f:
+            np.save(f, self.centroids)
+
+    def add(self, vectors: np.ndarray, start: int) -> None:
+        if self.centroids is None or (
+            self.trained_count < RETRAIN_LIMIT
+            and len(vectors) >= self.trained_count * RETRAIN_GROWTH
+        ):
+            self.train(vectors)
+            return
+        assignments = self._assign(vectors[start:])
+        with open(self.lists_path, "ab") as f:
+            f.write(assignments.tobytes())
+        self.assignments = np.concatenate([self.assignments, assignments])
+        self.count = len(vectors)
+        # Rows outside the sorted lists are scanned on every query
+        if self.count - self._merged > max(1024, self.count // 8):
+            self._build_lists()
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        queries: np.ndarray,
+        k: int,
+        min_score: float | None = None,
+    ) -> List[np.ndarray]:
+        if self.centroids is None:
+            return top_k_indices(vectors, queries, k, min_score)
+        probes = min(self.probes, len(self.centroids))
+        centroid_scores = queries @ self.centroids.T
+        probed = np.argpartition(centroid_scores, -probes, axis=1)[:, -probes:]
+        tail = np.arange(self._merged, self.count)
+        results = []
+        for query, lists in zip(queries, probed):
+            rows = [self._rows[self._bounds[i] : self._bounds[i + 1]] for i in lists]
+            rows.append(tail[np.isin(self.assignments[self._merged :], lists)])
+            rows = np.sort(np.concatenate(rows))
+            best = top_k_indices(vectors[rows], query[np.newaxis], k, min_score)[0]
+            results.append(rows[best])
+        return results
+
+
+class HNSWIndex(AnnIndex):
+    """
+    A hierarchical navigable small world graph built with hnswlib
+
+        A larger `ef` explores more of the graph per query, finding more of the
+        true nearest rows at the cost of latency. The graph is saved to
+        {index}.hnsw when it has grown by a tenth and when Mini-Boss exits, and
+        rows added after the last save are indexed again when it is loaded.
+    """
+
+    def __init__(self, workspace_path: Path, index: str, ef: int = 64) -> None:
+        self.path = workspace_path / f"{index}.hnsw"
+        self.ef = ef
+        self.graph = None
+        self.dim = None
+        self.saved_count = 0
+        atexit.register(self.save)
+
+    def _load(self, dim: int) -> None:
+        self.dim = dim
+        self.graph = hnswlib.Index(space="ip", dim=dim)
+        try:
+            self.graph.load_index(str(self.path))
+            self.count = self.saved_count = self.graph.get_current_count()
+        except RuntimeError:
+            self.graph.init_index(max_elements=1024, ef_construction=200, M=16)
+            self.count = self.saved_count = 0
+
+    def reset(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self.graph = None
+        self.count = self.saved_count = 0
+
+    def sync(self, vectors: np.ndarray) -> None:
+        if self.graph is not None and self.dim != vectors.shape[1]:
+            self.reset()
+        if self.graph is None:
+            self._load(vectors.shape[1])
+        super().sync(vectors)
+
+    def add(self, vectors: np.ndarray, start: int) -> None:
+        if self.graph is None:
+            self._load(vectors.shape[1])
+        if len(vectors) > self.graph.get_max_elements():
+            self.graph.resize_index(
+                max(len(vectors), 2 * self.graph.get_max_elements())
+            )
+        self.graph.add_items(
+            np.asarray(vectors[start:]), np.arange(start, len(vectors))
+        )
+        self.count = len(vectors)
+        if self.count - self.saved_count >= max(1024, self.saved_count // 10):
+            self.save()
+
+    def save(self) -> None:
+        if self.graph is None or self.count == self.saved_count:
+            return
+        replace_file(self.path, lambda path: self.graph.save_index(str(path)))
+        self.saved_count = self.count
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        queries: np.ndarray,
+        k: int,
+        min_score: float | None = None,
+    ) -> List[np.ndarray]:
+        k = min(k, self.count)
+        if k <= 0:
+            return [np.empty(0, dtype=np.int64) for _ in queries]
+        self.graph.set_ef(max(self.ef, k))
+        labels, distances = self.graph.knn_query(queries, k=k)
+        labels = labels.astype(np.int64)
+        if min_score is None:
+            return list(labels)
+        # The inner product space measures distance as 1 - dot product
+        return [
+            row[1 - row_distances >= min_score]
+            for row, row_distances in zip(labels, distances)
+        ]
+
+
+def create_ann_index(cfg, workspace_path: Path, index: str) -> AnnIndex | None:
+    """
+    Create the approximate nearest neighbour index set by LOCAL_MEMORY_ANN
+
+    Args:
+        cfg: Config object
+        workspace_path: The directory the index files are kept in
+        index: The name of the memory index
+
+    Returns: The index, or None if the local memory is searched exactly
+    """
+    kind = cfg.local_memory_ann
+    if not kind:
+        return None
+    if kind == "hnsw":
+        if hnswlib is not None:
+            return HNSWIndex(workspace_path, index, cfg.local_memory_ann_ef)
+        logger.warn(
+            "Error: hnswlib is not installed. Please install hnswlib to use an"
+            " HNSW index for the local memory, using an IVF index instead."
+        )
+    elif kind != "ivf":
+        logger.warn(f"Unknown LOCAL_MEMORY_ANN {kind}, using an IVF index instead.")
+    return IVFIndex(workspace_path, index, cfg.local_memory_ann_probes)
@@ -10,6 +10,11 @@ class MemoryProviderSingleton(AbstractSingleton):
         """Adds to memory"""
         pass
 
+    def add_many(self, data):
+        """Adds several texts to memory, with one bulk call where the backend
+        supports it"""
+        return [self.add(text) for text in data]
+
     @abc.abstractmethod
     def get(self, data):
         """Gets from memory"""
@@ -25,6 +30,10 @@ class MemoryProviderSingleton(AbstractSingleton):
         """Gets relevant memory for"""
         pass
 
+    def get_relevant_many(self, data, num_relevant=5):
+        """Gets relevant memory for several texts"""
+        return [self.get_relevant(text, num_relevant) for text in data]
+
     @abc.abstractmethod
     def get_stats(self):
         """Get stats from memory"""
@@ -1,33 +1,211 @@
 from __future__ import annotations
 
-import dataclasses
+import json
+import os
+import tempfile
+import threading
 from pathlib import Path
 from typing import Any, List
 
 import numpy as np
-import orjson
 
-from miniboss.llm import get_ada_embedding
+from miniboss.llm import get_ada_embeddings
+from miniboss.memory.ann import (
+    QuantizedRows,
+    create_ann_index,
+    get_embedding_dtype,
+    normalize_rows,
+    quantize_rows,
+    top_k_indices,
+)
 from miniboss.memory.base import MemoryProviderSingleton
 
 EMBED_DIM = 1536
-SAVE_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SERIALIZE_DATACLASS
+# The rows the cache files start with, they double whenever they are full
+INITIAL_CAPACITY = 64
 
 
-def create_default_embeddings():
-    return np.zeros((0, EMBED_DIM)).astype(np.float32)
+class CacheContent:
+    """
+    The texts and embeddings of a LocalCache, memory-mapped from files in the
+        workspace so that they are kept between runs:
+
+        {index}.embeddings.npy  float32, float16 or int8 matrix with a row of
+                                length one per text, so that a dot product is
+                                a cosine similarity, padded to a capacity that
+                                doubles whenever it is full
+        {index}.scales.npy      float32 scale of each int8 row, padded likewise
+        {index}.offsets.npy     int64 offset in the blob where each text ends,
+                                padded like the embeddings
+        {index}.texts.bin       the utf-8 texts back to back
+        {index}.meta.json       the number of texts, written last so that an
+                                interrupted add is ignored when reloading
+
+        Opening the files only reads their headers, the rows are paged in by the
+        operating system as they are used.
+    """
+
+    def __init__(
+        self, workspace_path: Path, index: str, dtype: str = "float32"
+    ) -> None:
+        self.embeddings_path = workspace_path / f"{index}.embeddings.npy"
+        self.scales_path = workspace_path / f"{index}.scales.npy"
+        self.offsets_path = workspace_path / f"{index}.offsets.npy"
+        self.texts_path = workspace_path / f"{index}.texts.bin"
+        self.meta_path = workspace_path / f"{index}.meta.json"
+        self.dtype = dtype
+        self._lock = threading.RLock()
+        self.count = 0
+        self.scales = None
+        self.load()
+
+    def load(self) -> None:
+        """Open the cache files, creating them if they do not exist"""
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                self.count = json.load(f)["count"]
+            self.embeddings = np.load(self.embeddings_path, mmap_mode="r+")
+            self.offsets = np.load(self.offsets_path, mmap_mode="r+")
+            if self.embeddings.dtype == np.int8:
+                self.scales = np.load(self.scales_path, mmap_mode="r+")
+        except (OSError, ValueError, KeyError):
+            self.embeddings = self.offsets = None
+            self.reset()
+        if self.embeddings.dtype != np.dtype(self.dtype):
+            self.convert()
+
+    def convert(self) -> None:
+        """Store the embeddings as `dtype`, after it was changed"""
+        with self._lock:
+            rows, scales = quantize_rows(
+                np.asarray(self.vectors[:], dtype=np.float32), self.dtype
+            )
+            self._replace_embeddings(rows, scales, len(self.embeddings))
+
+    def reset(self, dim: int = EMBED_DIM) -> None:
+        """Empty the cache files"""
+        with self._lock:
+            self.count = 0
+            self._write_meta()
+            rows, scales = quantize_rows(np.empty((0, dim), np.float32), self.dtype)
+            self._replace_embeddings(rows, scales, INITIAL_CAPACITY)
+            self.offsets = self._replace(self.offsets_path, np.int64, (0,))
+            self.texts_path.write_bytes(b"")
+
+    def _replace(self, path: Path, dtype, shape, rows=None, capacity=INITIAL_CAPACITY):
+        """
+        Write a new file of `capacity` rows with the given rows at its start, and
+            map it. The file is written next to the old one and renamed over it,
+            so arrays that still map the old file stay valid.
+        """
+        temp_path = path.with_name(f".{path.name}.tmp")
+        array = np.lib.format.open_memmap(
+            temp_path, mode="w+", dtype=dtype, shape=(capacity, *shape[1:])
+        )
+        if rows is not None:
+            array[: len(rows)] = rows
+        array.flush()
+        del array
+        os.replace(temp_path, path)
+        return np.load(path, mmap_mode="r+")
+
+    def _replace_embeddings(self, rows, scales, capacity: int) -> None:
+        self.embeddings = self._replace(
+            self.embeddings_path, rows.dtype, rows.shape, rows, capacity
+        )
+        if scales is None:
+            self.scales = None
+            self.scales_path.unlink(missing_ok=True)
+        else:
+            self.scales = self._replace(
+                self.scales_path, np.float32, scales.shape, scales, capacity
+            )
+
+    def _write_meta(self) -> None:
+        file_descriptor, temp_path = tempfile.mkstemp(
+            prefix=f".{self.meta_path.name}.", dir=self.meta_path.parent
+        )
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as f:
+            json.dump({"count": self.count}, f)
+        os.replace(temp_path, self.meta_path)
+
+    @property
+    def vectors(self) -> np.ndarray | QuantizedRows:
+        """The rows of the embeddings matrix that hold an embedding"""
+        if self.embeddings.dtype == np.float32:
+            return self.embeddings[: self.count]
+        scales = None if self.scales is None else self.scales[: self.count]
+        return QuantizedRows(self.embeddings[: self.count], scales)
+
+    def texts(self, indices) -> List[str]:
+        """
+        Read texts from the blob
 
+        Args:
+            indices: The indices of the texts
 
-@dataclasses.dataclass
-class CacheContent:
-    texts: List[str] = dataclasses.field(default_factory=list)
-    embeddings: np.ndarray = dataclasses.field(
-        default_factory=create_default_embeddings
-    )
+        Returns: List[str]
+        """
+        texts = []
+        with open(self.texts_path, "rb") as f:
+            for i in indices:
+                start = int(self.offsets[i - 1]) if i > 0 else 0
+                f.seek(start)
+                texts.append(f.read(int(self.offsets[i]) - start).decode("utf-8"))
+        return texts
+
+    def append(self, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Append texts and their embeddings to the cache files, doubling the
+            matrices when they are full so that appending is O(1) amortized
+
+        Args:
+            texts: List[str]
+            vectors: np.ndarray with one row per text
+
+        Returns: None
+        """
+        with self._lock:
+            if self.count == 0 and vectors.shape[1] != self.embeddings.shape[1]:
+                self.reset(vectors.shape[1])
+            needed = self.count + len(vectors)
+            if needed > len(self.embeddings):
+                capacity = len(self.embeddings)
+                while capacity < needed:
+                    capacity *= 2
+                scales = None if self.scales is None else self.scales[: self.count]
+                self._replace_embeddings(
+                    self.embeddings[: self.count], scales, capacity
+                )
+                self.offsets = self._replace(
+                    self.offsets_path,
+                    np.int64,
+                    self.offsets.shape,
+                    self.offsets[: self.count],
+                    capacity,
+                )
+
+            encoded = [text.encode("utf-8") for text in texts]
+            with open(self.texts_path, "r+b") as f:
+                end = int(self.offsets[self.count - 1]) if self.count else 0
+                f.seek(end)
+                f.write(b"".join(encoded))
+                f.truncate()
+            ends = end + np.cumsum([len(text) for text in encoded], dtype=np.int64)
+
+            rows, scales = quantize_rows(normalize_rows(vectors), self.dtype)
+            self.embeddings[self.count : needed] = rows
+            if scales is not None:
+                self.scales[self.count : needed] = scales
+            self.offsets[self.count : needed] = ends
+            # Written through the page cache, so a crash of the process loses
+            # nothing once the count is saved
+            self.count = needed
+            self._write_meta()
 
 
 class LocalCache(MemoryProviderSingleton):
-    """A class that stores the memory in a local file"""
+    """A class that stores the memory in local files"""
 
     def __init__(self, cfg) -> None:
         """Initialize a class instance
@@ -39,15 +217,23 @@ class LocalCache(MemoryProviderSingleton):
             None
         """
         workspace_path = Path(cfg.workspace_path)
-        self.filename = workspace_path / f"{cfg.memory_index}.json"
-
-        self.filename.touch(exist_ok=True)
+        self.data = CacheContent(
+            workspace_path, cfg.memory_index, get_embedding_dtype(cfg)
+        )
+        self.index = create_ann_index(cfg, workspace_path, cfg.memory_index)
+        self.index_min_size = cfg.local_memory_ann_min_size
 
-        file_content = b"{}"
-        with self.filename.open("w+b") as f:
-            f.write(file_content)
+    def sync_index(self) -> bool:
+        """
+        Bring the approximate nearest neighbour index up to date, once the memory
+            is large enough to use it
 
-        self.data = CacheContent()
+        Returns: Whether the index should be searched
+        """
+        if self.index is None or self.data.count < self.index_min_size:
+            return False
+        self.index.sync(self.data.vectors)
+        return True
 
     def add(self, text: str):
         """
@@ -59,26 +245,28 @@ class LocalCache(MemoryProviderSingleton):
 
         Returns: None
         """
-        if "Command Error:" in text:
-            return ""
-        self.data.texts.append(text)
+        return self.add_many([text])[0]
 
-        embedding = get_ada_embedding(text)
+    def add_many(self, texts: List[str]) -> List[str]:
+        """
+        Add several texts to our list of texts, embedding them in as few requests
+            as possible and appending them to the cache files once
 
-        vector = np.array(embedding).astype(np.float32)
-        vector = vector[np.newaxis, :]
-        self.data.embeddings = np.concatenate(
-            [
-                self.data.embeddings,
-                vector,
-            ],
-            axis=0,
-        )
+        Args:
+            texts: List[str]
+
+        Returns: The texts that were added, with "" for the ones that were skipped
+        """
+        added = [text for text in texts if "Command Error:" not in text]
+        if not added:
+            return ["" for _ in texts]
+
+        embeddings = get_ada_embeddings(added)
 
-        with open(self.filename, "wb") as f:
-            out = orjson.dumps(self.data, option=SAVE_OPTIONS)
-            f.write(out)
-        return text
+        vectors = np.array(embeddings, dtype=np.float32)
+        self.data.append(added, vectors)
+        self.sync_index()
+        return ["" if "Command Error:" in text else text for text in texts]
 
     def clear(self) -> str:
         """
@@ -86,7 +274,9 @@ class LocalCache(MemoryProviderSingleton):
 
         Returns: A message indicating that the memory has been cleared.
         """
-        self.data = CacheContent()
+        self.data.reset()
+        if self.index is not None:
+            self.index.reset()
         return "Obliviated"
 
     def get(self, data: str) -> list[Any] | None:
@@ -100,27 +290,49 @@ class LocalCache(MemoryProviderSingleton):
         """
         return self.get_relevant(data, 1)
 
-    def get_relevant(self, text: str, k: int) -> list[Any]:
-        """ "
-        matrix-vector mult to find score-for-each-row-of-matrix
-         get indices for top-k winning scores
-         return texts for those indices
+    def get_relevant(
+        self, text: str, k: int, min_score: float | None = None
+    ) -> list[Any]:
+        """
+        Gets the k texts most similar to the given text
+
         Args:
             text: str
             k: int
+            min_score: The lowest cosine similarity of a returned text, if any
 
         Returns: List[str]
         """
-        embedding = get_ada_embedding(text)
+        return self.get_relevant_many([text], k, min_score)[0]
 
-        scores = np.dot(self.data.embeddings, embedding)
+    def get_relevant_many(
+        self, texts: List[str], k: int, min_score: float | None = None
+    ) -> List[List[str]]:
+        """
+        Gets the k most similar texts for each of several texts, embedding them
+            in one request and scoring them in one matrix multiplication
 
-        top_k_indices = np.argsort(scores)[-k:][::-1]
+        Args:
+            texts: List[str]
+            k: int
+            min_score: The lowest cosine similarity of a returned text, if any
 
-        return [self.data.texts[i] for i in top_k_indices]
+        Returns: List[List[str]]
+        """
+        if not texts:
+            return []
+        queries = normalize_rows(np.array(get_ada_embeddings(texts), dtype=np.float32))
+        if self.sync_index():
+            search = self.index.search
+        else:
+            search = top_k_indices
+        return [
+            self.data.texts(indices)
+            for indices in search(self.data.vectors, queries, k, min_score)
+        ]
 
     def get_stats(self) -> tuple[int, tuple[int, ...]]:
         """
         Returns: The stats of the local cache.
         """
-        return len(self.data.texts), self.data.embeddings.shape
+        return self.data.count, self.data.vectors.shape
@@ -4,7 +4,7 @@ import re
 from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections
 
 from miniboss.config import Config
-from miniboss.llm import get_ada_embedding
+from miniboss.llm import get_ada_embedding, get_ada_embeddings
 from miniboss.memory.base import MemoryProviderSingleton
 
 
@@ -99,13 +99,27 @@ class MilvusMemory(MemoryProviderSingleton):
         Returns:
             str: log.
         """
-        embedding = get_ada_embedding(data)
-        result = self.collection.insert([[embedding], [data]])
-        _text = (
+        return self.add_many([data])[0]
+
+    def add_many(self, data) -> list:
+        """Add the embeddings of several texts into memory in one column insert.
+
+        Args:
+            data (list[str]): The raw texts to construct embedding indexes.
+
+        Returns:
+            list[str]: A log for each text.
+        """
+        if not data:
+            return []
+        data = list(data)
+        embeddings = get_ada_embeddings(data)
+        result = self.collection.insert([embeddings, data])
+        return [
             "Inserting data into memory at primary key: "
-            f"{result.primary_keys[0]}:\n data: {data}"
-        )
-        return _text
+            f"{primary_key}:\n data: {text}"
+            for primary_key, text in zip(result.primary_keys, data)
+        ]
 
     def get(self, data):
         """Return the most relevant data in memory.
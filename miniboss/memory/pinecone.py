@@ -1,10 +1,13 @@
 import pinecone
 from colorama import Fore, Style
 
-from miniboss.llm import get_ada_embedding
+from miniboss.llm import get_ada_embedding, get_ada_embeddings
 from miniboss.logs import logger
 from miniboss.memory.base import MemoryProviderSingleton
 
+# The most vectors Pinecone recommends upserting in one request
+UPSERT_BATCH_SIZE = 100
+
 
 class PineconeMemory(MemoryProviderSingleton):
     def __init__(self, cfg):
@@ -47,12 +50,26 @@ class PineconeMemory(MemoryProviderSingleton):
         self.index = pinecone.Index(table_name)
 
     def add(self, data):
-        vector = get_ada_embedding(data)
-        # no metadata here. We may wish to change that long term.
-        self.index.upsert([(str(self.vec_num), vector, {"raw_text": data})])
-        _text = f"Inserting data into memory at index: {self.vec_num}:\n data: {data}"
-        self.vec_num += 1
-        return _text
+        return self.add_many([data])[0]
+
+    def add_many(self, data):
+        """
+        Adds several texts to the memory, embedding them in as few requests as
+        possible and upserting them in batches.
+        :param data: The texts to add.
+        """
+        vectors = get_ada_embeddings(data) if data else []
+        items = []
+        messages = []
+        for text, vector in zip(data, vectors):
+            items.append((str(self.vec_num), vector, {"raw_text": text}))
+            messages.append(
+                f"Inserting data into memory at index: {self.vec_num}:\n data: {text}"
+            )
+            self.vec_num += 1
+        for start in range(0, len(items), UPSERT_BATCH_SIZE):
+            self.index.upsert(items[start : start + UPSERT_BATCH_SIZE])
+        return messages
 
     def get(self, data):
         return self.get_relevant(data, 1)
@@ -10,18 +10,54 @@ from redis.commands.search.field import TextField, VectorField
 from redis.commands.search.indexDefinition import IndexDefinition, IndexType
 from redis.commands.search.query import Query
 
-from miniboss.llm import get_ada_embedding
+from miniboss.llm import get_ada_embeddings
 from miniboss.logs import logger
+from miniboss.memory.ann import get_embedding_dtype, quantize_rows
 from miniboss.memory.base import MemoryProviderSingleton
 
-SCHEMA = [
-    TextField("data"),
-    VectorField(
-        "embedding",
-        "HNSW",
-        {"TYPE": "FLOAT32", "DIM": 1536, "DISTANCE_METRIC": "COSINE"},
-    ),
-]
+# The Redis vector type each MEMORY_EMBEDDING_DTYPE is stored as
+VECTOR_TYPES = {"float32": "FLOAT32", "float16": "FLOAT16", "int8": "INT8"}
+
+
+def create_schema(vector_type: str = "FLOAT32") -> list:
+    """
+    Creates the schema of the memory index.
+
+    Args:
+        vector_type: The Redis type of the embeddings, e.g. FLOAT16.
+
+    Returns: The fields of the index.
+    """
+    return [
+        TextField("data"),
+        VectorField(
+            "embedding",
+            "HNSW",
+            {"TYPE": vector_type, "DIM": 1536, "DISTANCE_METRIC": "COSINE"},
+        ),
+    ]
+
+
+SCHEMA = create_schema()
+
+
+def parse_search_reply(reply) -> list[str]:
+    """
+    Gets the data of the documents found by an FT.SEARCH run in a pipeline.
+
+    Args:
+        reply: The raw reply: the total, then each document id and its fields.
+
+    Returns: The data of each document.
+    """
+    if hasattr(reply, "docs"):
+        return [doc.data for doc in reply.docs]
+    found = []
+    for fields in reply[2::2]:
+        values = dict(zip(fields[::2], fields[1::2]))
+        data = values.get(b"data", values.get("data"))
+        found.append(data.decode("utf-8") if isinstance(data, bytes) else data)
+    return found
 
 
 class RedisMemory(MemoryProviderSingleton):
@@ -38,13 +74,16 @@ class RedisMemory(MemoryProviderSingleton):
         redis_port = cfg.redis_port
         redis_password = cfg.redis_password
         self.dimension = 1536
-        self.redis = redis.Redis(
+        self.pool = redis.ConnectionPool(
             host=redis_host,
             port=redis_port,
             password=redis_password,
             db=0,  # Cannot be changed
+            max_connections=cfg.redis_max_connections,
         )
+        self.redis = redis.Redis(connection_pool=self.pool)
         self.cfg = cfg
+        self.embedding_dtype = get_embedding_dtype(cfg)
 
         # Check redis connection
         try:
@@ -65,9 +104,10 @@ class RedisMemory(MemoryProviderSingleton):
 
         if cfg.wipe_redis_on_start:
             self.redis.flushall()
+        self.index = self.redis.ft(f"{cfg.memory_index}")
         try:
-            self.redis.ft(f"{cfg.memory_index}").create_index(
-                fields=SCHEMA,
+            self.index.create_index(
+                fields=create_schema(VECTOR_TYPES[self.embedding_dtype]),
                 definition=IndexDefinition(
                     prefix=[f"{cfg.memory_index}:"], index_type=IndexType.HASH
                 ),
@@ -77,6 +117,21 @@ class RedisMemory(MemoryProviderSingleton):
         existing_vec_num = self.redis.get(f"{cfg.memory_index}-vec_num")
         self.vec_num = int(existing_vec_num.decode("utf-8")) if existing_vec_num else 0
 
+    def to_bytes(self, embedding: list[float]) -> bytes:
+        """
+        Converts an embedding to the type of the index vectors.
+
+        int8 vectors are scaled to use the whole int8 range. The scale is not
+        kept, since it does not change their cosine distance.
+
+        Args:
+            embedding: The embedding.
+
+        Returns: The vector as bytes.
+        """
+        vector = np.array(embedding, dtype=np.float32)[np.newaxis]
+        return quantize_rows(vector, self.embedding_dtype)[0].tobytes()
+
     def add(self, data: str) -> str:
         """
         Adds a data point to the memory.
@@ -86,20 +141,36 @@ class RedisMemory(MemoryProviderSingleton):
 
         Returns: Message indicating that the data has been added.
         """
-        if "Command Error:" in data:
-            return ""
-        vector = get_ada_embedding(data)
-        vector = np.array(vector).astype(np.float32).tobytes()
-        data_dict = {b"data": data, "embedding": vector}
-        pipe = self.redis.pipeline()
-        pipe.hset(f"{self.cfg.memory_index}:{self.vec_num}", mapping=data_dict)
-        _text = (
-            f"Inserting data into memory at index: {self.vec_num}:\n" f"data: {data}"
-        )
-        self.vec_num += 1
+        return self.add_many([data])[0]
+
+    def add_many(self, data: list[str]) -> list[str]:
+        """
+        Adds several data points to the memory, embedding them in as few requests
+        as possible and writing them in one round trip.
+
+        Args:
+            data: The data to add.
+
+        Returns: A message for each data point indicating that it has been added.
+        """
+        added = [text for text in data if "Command Error:" not in text]
+        if not added:
+            return ["" for _ in data]
+        vectors = get_ada_embeddings(added)
+        pipe = self.redis.pipeline(transaction=False)
+        messages = {}
+        for text, vector in zip(added, vectors):
+            vector = self.to_bytes(vector)
+            data_dict = {b"data": text, "embedding": vector}
+            pipe.hset(f"{self.cfg.memory_index}:{self.vec_num}", mapping=data_dict)
+            messages[text] = (
+                f"Inserting data into memory at index: {self.vec_num}:\n"
+                f"data: {text}"
+            )
+            self.vec_num += 1
         pipe.set(f"{self.cfg.memory_index}-vec_num", self.vec_num)
         pipe.execute()
-        return _text
+        return [messages.get(text, "") for text in data]
 
     def get(self, data: str) -> list[Any] | None:
         """
@@ -130,7 +201,24 @@ class RedisMemory(MemoryProviderSingleton):
 
         Returns: A list of the most relevant data.
         """
-        query_embedding = get_ada_embedding(data)
+        return self.get_relevant_many([data], num_relevant)[0]
+
+    def get_relevant_many(
+        self, data: list[str], num_relevant: int = 5
+    ) -> list[list[Any] | None]:
+        """
+        Returns the data in the memory that is relevant to each of several data
+        points, embedding them in one request and searching in one round trip.
+
+        Args:
+            data: The data to compare to.
+            num_relevant: The number of relevant data to return for each.
+
+        Returns: A list of the most relevant data for each data point.
+        """
+        if not data:
+            return []
+        query_embeddings = get_ada_embeddings(data)
         base_query = f"*=>[KNN {num_relevant} @embedding $vector AS vector_score]"
         query = (
             Query(base_query)
@@ -138,19 +226,21 @@ class RedisMemory(MemoryProviderSingleton):
             .sort_by("vector_score")
             .dialect(2)
         )
-        query_vector = np.array(query_embedding).astype(np.float32).tobytes()
+        pipe = self.redis.pipeline(transaction=False)
+        index = pipe.ft(f"{self.cfg.memory_index}")
+        for query_embedding in query_embeddings:
+            query_vector = self.to_bytes(query_embedding)
+            index.search(query, query_params={"vector": query_vector})
 
         try:
-            results = self.redis.ft(f"{self.cfg.memory_index}").search(
-                query, query_params={"vector": query_vector}
-            )
+            replies = pipe.execute()
         except Exception as e:
             logger.warn("Error calling Redis search: ", e)
-            return None
-        return [result.data for result in results.docs]
+            return [None for _ in data]
+        return [parse_search_reply(reply) for reply in replies]
 
     def get_stats(self):
         """
         Returns: The stats of the memory index.
         """
-        return self.redis.ft(f"{self.cfg.memory_index}").info()
+        return self.index.info()
@@ -3,7 +3,7 @@ from weaviate import Client
 from weaviate.embedded import EmbeddedOptions
 from weaviate.util import generate_uuid5
 
-from miniboss.llm import get_ada_embedding
+from miniboss.llm import get_ada_embedding, get_ada_embeddings
 from miniboss.logs import logger
 from miniboss.memory.base import MemoryProviderSingleton
 
@@ -44,6 +44,9 @@ class WeaviateMemory(MemoryProviderSingleton):
 
         self.index = WeaviateMemory.format_classname(cfg.memory_index)
         self._create_schema()
+        # Objects are sent in batches of this size, the batch is flushed after
+        # each add
+        self.client.batch.configure(batch_size=cfg.weaviate_batch_size)
 
     @staticmethod
     def format_classname(index):
@@ -71,20 +74,26 @@ class WeaviateMemory(MemoryProviderSingleton):
             return None
 
     def add(self, data):
-        vector = get_ada_embedding(data)
+        return self.add_many([data])[0]
 
-        doc_uuid = generate_uuid5(data, self.index)
-        data_object = {"raw_text": data}
+    def add_many(self, data):
+        vectors = get_ada_embeddings(data) if data else []
+        messages = []
 
         with self.client.batch as batch:
-            batch.add_data_object(
-                uuid=doc_uuid,
-                data_object=data_object,
-                class_name=self.index,
-                vector=vector,
-            )
+            for text, vector in zip(data, vectors):
+                doc_uuid = generate_uuid5(text, self.index)
+                batch.add_data_object(
+                    uuid=doc_uuid,
+                    data_object={"raw_text": text},
+                    class_name=self.index,
+                    vector=vector,
+                )
+                messages.append(
+                    f"Inserting data into memory at uuid: {doc_uuid}:\n data: {text}"
+                )
 
-        return f"Inserting data into memory at uuid: {doc_uuid}:\n data: {data}"
+        return messages
 
     def get(self, data):
         return self.get_relevant(data, 1)
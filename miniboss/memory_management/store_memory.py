@@ -22,12 +22,17 @@ def format_memory(assistant_reply, next_message_content):
 def save_memory_trimmed_from_context_window(
     full_message_history, next_message_to_add_index, permanent_memory
 ):
+    memories_to_add = []
     while next_message_to_add_index >= 0:
         message_content = full_message_history[next_message_to_add_index]["content"]
         if is_string_valid_json(message_content, LLM_DEFAULT_RESPONSE_FORMAT):
             next_message = full_message_history[next_message_to_add_index + 1]
             memory_to_add = format_memory(message_content, next_message["content"])
             logger.debug(f"Storing the following memory: {memory_to_add}")
-            permanent_memory.add(memory_to_add)
+            memories_to_add.append(memory_to_add)
 
         next_message_to_add_index -= 1
+
+    # Store the trimmed messages together, in one request to the memory backend
+    if memories_to_add:
+        permanent_memory.add_many(memories_to_add)
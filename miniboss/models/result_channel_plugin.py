@@ -0,0 +1,67 @@
+"""An Auto-GPT plugin that reports the commands of a Buddy's run to Mini-Boss."""
+import json
+import os
+from typing import Any, Dict, Tuple
+
+# Imported relatively, so that the plugin zip Auto-GPT loads can carry this module
+# and the base class without importing the rest of Mini-Boss
+from .base_open_ai_plugin import BaseOpenAIPlugin
+
+# The environment variable the Auto-GPT subprocess finds the channel path in
+RESULT_FILE_ENV = "MINIBOSS_RESULT_FILE"
+
+
+def write_result_record(path: str, command_name: str, arguments: dict) -> None:
+    """
+    Append a command record to a result channel file.
+
+    Args:
+        path (str): The path of the channel file.
+        command_name (str): The name of the command.
+        arguments (dict): The arguments of the command.
+    """
+    line = json.dumps({"command": command_name, "arguments": arguments}, default=str)
+    with open(path, "a", encoding="utf-8") as channel_file:
+        channel_file.write(line + "\n")
+        channel_file.flush()
+
+
+class ResultChannelPlugin(BaseOpenAIPlugin):
+    """
+    Writes every command Auto-GPT runs to the result channel of the Buddy that
+        launched it, from the pre_command hook.
+    """
+
+    def __init__(self):
+        super().__init__(
+            {
+                "manifest": {
+                    "name_for_model": "ResultChannelPlugin",
+                    "schema_version": "0.1",
+                    "description_for_model": "Reports commands to Mini-Boss.",
+                },
+                "client": None,
+                "openapi_spec": None,
+            }
+        )
+        self.path = os.getenv(RESULT_FILE_ENV)
+
+    def can_handle_pre_command(self) -> bool:
+        """This method is called to check that the plugin can
+        handle the pre_command method.
+        Returns:
+            bool: True if Auto-GPT was launched by a Buddy."""
+        return bool(self.path)
+
+    def pre_command(
+        self, command_name: str, arguments: Dict[str, Any]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """This method is called before the command is executed.
+        Args:
+            command_name (str): The command name.
+            arguments (Dict[str, Any]): The arguments.
+        Returns:
+            Tuple[str, Dict[str, Any]]: The command name and the arguments.
+        """
+        write_result_record(self.path, command_name, arguments)
+        return command_name, arguments
@@ -1,17 +1,60 @@
 """Text processing functions"""
-from typing import Dict, Generator, Optional
+import asyncio
+import functools
+from typing import Dict, Generator, List, Optional
 
 import spacy
 from selenium.webdriver.remote.webdriver import WebDriver
+from spacy.language import Language
 
 from miniboss.config import Config
-from miniboss.llm import count_message_tokens, create_chat_completion
+from miniboss.llm import (
+    count_message_tokens,
+    count_string_tokens,
+    create_chat_completion,
+)
+from miniboss.llm.async_client import AsyncLLMClient
+from miniboss.llm.token_counter import get_encoding
 from miniboss.logs import logger
 from miniboss.memory import get_memory
 
 CFG = Config()
 
 
+@functools.lru_cache(maxsize=None)
+def get_sentencizer(language_model: str) -> Language:
+    """Load a spaCy pipeline with a sentencizer, once per language model
+
+    Args:
+        language_model (str): The name of the spaCy language model
+
+    Returns:
+        Language: The spaCy pipeline
+    """
+    nlp = spacy.load(language_model)
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
+def split_into_token_windows(text: str, window_size: int, model: str) -> List[str]:
+    """Split text into pieces of at most window_size tokens
+
+    Args:
+        text (str): The text to split
+        window_size (int): The maximum number of tokens in each piece
+        model (str): The model whose tokenizer is used
+
+    Returns:
+        List[str]: The pieces of text
+    """
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text)
+    return [
+        encoding.decode(tokens[start : start + window_size])
+        for start in range(0, len(tokens), window_size)
+    ]
+
+
 def split_text(
     text: str,
     max_length: int = CFG.browse_chunk_max_length,
@@ -20,6 +63,10 @@ def split_text(
 ) -> Generator[str, None, None]:
     """Split text into chunks of a maximum length
 
+    Sentences are tokenized once and packed into chunks by their running token
+    total. A sentence that does not fit in a chunk on its own is split into
+    token windows.
+
     Args:
         text (str): The text to split
         max_length (int, optional): The maximum length of each chunk. Defaults to 8192.
@@ -28,41 +75,46 @@ def split_text(
         str: The next chunk of text
 
     Raises:
-        ValueError: If the text is longer than the maximum length
+        ValueError: If the question leaves no room for text in a chunk
     """
+    # The tokens the summary prompt takes up around the chunk
+    overhead = count_message_tokens([create_message("", question)], model) + 1
+    chunk_budget = max_length - overhead
+    if chunk_budget <= 0:
+        raise ValueError(
+            f"Question is too long to summarize text: {overhead} tokens of prompt."
+        )
+
     flatened_paragraphs = " ".join(text.split("\n"))
-    nlp = spacy.load(CFG.browse_spacy_language_model)
-    nlp.add_pipe("sentencizer")
+    nlp = get_sentencizer(CFG.browse_spacy_language_model)
     doc = nlp(flatened_paragraphs)
-    sentences = [sent.text.strip() for sent in doc.sents]
 
     current_chunk = []
-
-    for sentence in sentences:
-        message_with_additional_sentence = [
-            create_message(" ".join(current_chunk) + " " + sentence, question)
-        ]
-
-        expected_token_usage = (
-            count_message_tokens(messages=message_with_additional_sentence, model=model)
-            + 1
-        )
-        if expected_token_usage <= max_length:
+    current_tokens = 0
+
+    for sent in doc.sents:
+        sentence = sent.text.strip()
+        if not sentence:
+            continue
+        sentence_tokens = count_string_tokens(sentence, model)
+        # Sentences are joined with a space, which takes at most one token
+        added_tokens = sentence_tokens + 1 if current_chunk else sentence_tokens
+        if current_tokens + added_tokens <= chunk_budget:
             current_chunk.append(sentence)
-        else:
+            current_tokens += added_tokens
+            continue
+
+        if current_chunk:
             yield " ".join(current_chunk)
-            current_chunk = [sentence]
-            message_this_sentence_only = [
-                create_message(" ".join(current_chunk), question)
-            ]
-            expected_token_usage = (
-                count_message_tokens(messages=message_this_sentence_only, model=model)
-                + 1
+        if sentence_tokens > chunk_budget:
+            logger.debug(
+                f"Sentence is too long in webpage: {sentence_tokens} tokens, splitting it."
             )
-            if expected_token_usage > max_length:
-                raise ValueError(
-                    f"Sentence is too long in webpage: {expected_token_usage} tokens."
-                )
+            *windows, sentence = split_into_token_windows(sentence, chunk_budget, model)
+            yield from windows
+            sentence_tokens = count_string_tokens(sentence, model)
+        current_chunk = [sentence]
+        current_tokens = sentence_tokens
 
     if current_chunk:
         yield " ".join(current_chunk)
@@ -89,52 +141,106 @@ def summarize_text(
     text_length = len(text)
     logger.info(f"Text length: {text_length} characters")
 
-    summaries = []
     chunks = list(
         split_text(
             text, max_length=CFG.browse_chunk_max_length, model=model, question=question
         ),
     )
-    scroll_ratio = 1 / len(chunks)
+    if not chunks:
+        return "Error: No text to summarize"
 
-    for i, chunk in enumerate(chunks):
-        if driver:
-            scroll_to_percentage(driver, scroll_ratio * i)
-        logger.info(f"Adding chunk {i + 1} / {len(chunks)} to memory")
+    summaries = summarize_chunks(chunks, question, model, driver)
+    logger.info(f"Summarized {len(chunks)} chunks.")
 
-        memory_to_add = f"Source: {url}\n" f"Raw content part#{i + 1}: {chunk}"
+    memories = [
+        f"Source: {url}\n" f"Raw content part#{i + 1}: {chunk}"
+        for i, chunk in enumerate(chunks)
+    ] + [
+        f"Source: {url}\n" f"Content summary part#{i + 1}: {summary}"
+        for i, summary in enumerate(summaries)
+    ]
+    logger.info(f"Adding {len(chunks)} chunks and their summaries to memory")
+    get_memory(CFG).add_many(memories)
 
-        memory = get_memory(CFG)
-        memory.add(memory_to_add)
+    combined_summary = "\n".join(summaries)
+    # Reduce the summaries level by level until they fit in a single prompt
+    while (
+        count_message_tokens([create_message(combined_summary, question)], model) + 1
+        > CFG.browse_chunk_max_length
+    ):
+        combined_chunks = list(
+            split_text(
+                combined_summary,
+                max_length=CFG.browse_chunk_max_length,
+                model=model,
+                question=question,
+            )
+        )
+        if len(combined_chunks) <= 1:
+            break
+        logger.info(f"Reducing {len(combined_chunks)} chunks of summaries")
+        reduced_summary = "\n".join(summarize_chunks(combined_chunks, question, model))
+        if len(reduced_summary) >= len(combined_summary):
+            # The summaries are not getting any shorter
+            break
+        combined_summary = reduced_summary
 
+    messages = [create_message(combined_summary, question)]
+
+    return create_chat_completion(
+        model=model,
+        messages=messages,
+    )
+
+
+def summarize_chunks(
+    chunks: List[str],
+    question: str,
+    model: str,
+    driver: Optional[WebDriver] = None,
+) -> List[str]:
+    """Summarize chunks of text concurrently
+
+    At most BROWSE_SUMMARY_CONCURRENCY chunks are summarized at the same time.
+
+    Args:
+        chunks (List[str]): The chunks of text to summarize
+        question (str): The question to ask the model
+        model (str): The model to summarize with
+        driver (WebDriver): The webdriver to scroll down the page as chunks are
+            summarized
+
+    Returns:
+        List[str]: The summary of each chunk, in the order of the chunks
+    """
+    summarized = 0
+
+    async def summarize_chunk(client: AsyncLLMClient, i: int, chunk: str) -> str:
         messages = [create_message(chunk, question)]
         tokens_for_chunk = count_message_tokens(messages, model)
         logger.info(
             f"Summarizing chunk {i + 1} / {len(chunks)} of length {len(chunk)} characters, or {tokens_for_chunk} tokens"
         )
-
-        summary = create_chat_completion(
+        summary = await client.create_chat_completion(
             model=model,
             messages=messages,
         )
-        summaries.append(summary)
         logger.info(
-            f"Added chunk {i + 1} summary to memory, of length {len(summary)} characters"
+            f"Summarized chunk {i + 1}, to a summary of length {len(summary)} characters"
         )
+        nonlocal summarized
+        summarized += 1
+        if driver:
+            scroll_to_percentage(driver, summarized / len(chunks))
+        return summary
 
-        memory_to_add = f"Source: {url}\n" f"Content summary part#{i + 1}: {summary}"
-
-        memory.add(memory_to_add)
-
-    logger.info(f"Summarized {len(chunks)} chunks.")
-
-    combined_summary = "\n".join(summaries)
-    messages = [create_message(combined_summary, question)]
+    async def summarize_all() -> List[str]:
+        async with AsyncLLMClient(CFG.browse_summary_concurrency) as client:
+            return await asyncio.gather(
+                *(summarize_chunk(client, i, chunk) for i, chunk in enumerate(chunks))
+            )
 
-    return create_chat_completion(
-        model=model,
-        messages=messages,
-    )
+    return asyncio.run(summarize_all())
 
 
 def scroll_to_percentage(driver: WebDriver, ratio: float) -> None:
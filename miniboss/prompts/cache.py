@@ -0,0 +1,133 @@
+""" A module for caching rendered system prompts and their token counts."""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Tuple
+
+# The most rendered prompts, and prompt token counts, kept
+PROMPT_CACHE_SIZE = 64
+
+
+def get_plugin_key(plugin: Any) -> Tuple:
+    """
+    Returns what identifies a plugin in a prompt cache key: its class, name and
+        version.
+
+    Args:
+        plugin (Any): The plugin.
+
+    Returns:
+        Tuple: The key of the plugin.
+    """
+    plugin_class = type(plugin)
+    return (
+        plugin_class.__module__,
+        plugin_class.__qualname__,
+        getattr(plugin, "_name", None),
+        getattr(plugin, "_version", None),
+    )
+
+
+class PromptCache:
+    """
+    An LRU cache of rendered system prompts, keyed by a hash of the settings they
+        are rendered from, the version of the command registry and the loaded
+        plugins, so that a prompt is only rendered again when one of them changes.
+        The token counts of the prompts are kept too, so the prompt is not
+        counted again every time the context is built.
+
+    The cached values are shared by every caller, so callers copy them before
+        changing them.
+    """
+
+    def __init__(self, max_size: int = PROMPT_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self._prompts = OrderedDict()
+        self._token_counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(settings: dict, command_registry, plugins: List[Any]) -> Tuple:
+        """
+        Returns the key a prompt is cached under.
+
+        Args:
+            settings (dict): The settings the prompt is rendered from.
+            command_registry (CommandRegistry): The registry of the commands listed
+                in the prompt, if any.
+            plugins (list): The loaded plugins, which may change the prompt.
+
+        Returns:
+            Tuple: The key.
+        """
+        settings_hash = hashlib.sha256(
+            json.dumps(settings, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        registry_version = (
+            None
+            if command_registry is None
+            else (command_registry.token, command_registry.version)
+        )
+        return settings_hash, registry_version, tuple(map(get_plugin_key, plugins))
+
+    def _put(self, cache: OrderedDict, key: Hashable, value: Any) -> None:
+        cache[key] = value
+        while len(cache) > self.max_size:
+            cache.popitem(last=False)
+
+    def get(self, key: Hashable, render: Callable[[], Any]) -> Any:
+        """
+        Returns the prompt cached under a key, rendering it if it is not cached.
+
+        Args:
+            key (Hashable): The key of the prompt.
+            render (Callable): Renders the prompt.
+
+        Returns:
+            Any: What render returned.
+        """
+        with self._lock:
+            if key in self._prompts:
+                self._prompts.move_to_end(key)
+                return self._prompts[key]
+        rendered = render()
+        with self._lock:
+            self._put(self._prompts, key, rendered)
+        return rendered
+
+    def count_message_tokens(self, prompt: str, model: str) -> int:
+        """
+        Returns the number of tokens the system message of a prompt uses, counting
+            it once per model.
+
+        Args:
+            prompt (str): The prompt.
+            model (str): The name of the model to use for tokenization.
+
+        Returns:
+            int: The number of tokens, without the tokens that prime the reply.
+        """
+        # The hash of a string is kept on it, so looking up the same prompt again
+        # does not read it
+        key = (prompt, model)
+        with self._lock:
+            if key in self._token_counts:
+                self._token_counts.move_to_end(key)
+                return self._token_counts[key]
+        # Imported here, as miniboss.llm imports this module
+        from miniboss.llm.token_counter import count_tokens_per_message
+
+        message = {"role": "system", "content": prompt}
+        token_count = count_tokens_per_message([message], model)[0]
+        with self._lock:
+            self._put(self._token_counts, key, token_count)
+        return token_count
+
+    def clear(self) -> None:
+        with self._lock:
+            self._prompts.clear()
+            self._token_counts.clear()
+
+
+prompt_cache = PromptCache()
@@ -1,4 +1,5 @@
 """ A module for generating custom prompt strings."""
+import copy
 import json
 from typing import Any, Callable, Dict, List, Optional
 
@@ -34,6 +35,27 @@ class PromptGenerator:
             "command": {"name": "command name", "args": {"arg name": "value"}},
         }
 
+    def copy(self) -> "PromptGenerator":
+        """
+        Return a copy of the generator whose lists can be changed without changing
+            this generator. The command registry and the functions of the commands,
+            which may be bound to a plugin, are shared.
+
+        Returns:
+            PromptGenerator: The copy.
+        """
+        generator = copy.copy(self)
+        generator.constraints = copy.copy(self.constraints)
+        generator.commands = [
+            {**command, "args": dict(command["args"])} for command in self.commands
+        ]
+        generator.resources = copy.copy(self.resources)
+        generator.performance_evaluation = copy.copy(self.performance_evaluation)
+        generator.job = copy.copy(self.job)
+        generator.tasks = copy.copy(self.tasks)
+        generator.response_format = copy.deepcopy(self.response_format)
+        return generator
+
     def add_constraint(self, constraint: str) -> None:
         """
         Add a constraint to the constraints list.
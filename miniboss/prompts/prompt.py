@@ -131,13 +131,21 @@ Continue ({CFG.authorise_key}/{CFG.exit_key}): """
     return config
 
 
-def construct_main_buddy_config(task, target_percentage, name) -> BuddyConfig:
+def construct_main_buddy_config(
+    task, target_percentage, name, settings_file=None
+) -> BuddyConfig:
     """Construct the prompt for the AI to respond to
 
+    Args:
+        settings_file (str, optional): The Buddy settings file to use.
+            Defaults to the configured buddy settings file.
+
     Returns:
         str: The prompt string
     """
-    config = BuddyConfig.load(CFG.buddy_settings_file)
+    if settings_file is None:
+        settings_file = CFG.buddy_settings_file
+    config = BuddyConfig.load(settings_file)
     if CFG.skip_reprompt and config.ai_name:
         logger.log_buddy_setup(config)
     elif config.ai_name:
@@ -161,20 +169,28 @@ Continue ({CFG.authorise_key}/{CFG.exit_key}): """
     # if no existing config
     if not config.ai_name:
         config = prompt_buddy(task, target_percentage, name)
-        config.save(CFG.buddy_settings_file)
+        config.save(settings_file)
         logger.log_buddy_setup(config)
 
     return config
 
 
-def create_main_buddy_config(task, target_percentage, name) -> BuddyConfig:
+def create_main_buddy_config(
+    task, target_percentage, name, settings_file=None
+) -> BuddyConfig:
     """Construct the prompt for the AI to respond to
 
+    Args:
+        settings_file (str, optional): The Buddy settings file to use.
+            Defaults to the configured buddy settings file.
+
     Returns:
         str: The prompt string
     """
+    if settings_file is None:
+        settings_file = CFG.buddy_settings_file
     config = prompt_buddy(task, target_percentage, name)
-    config.save(CFG.buddy_settings_file)
+    config.save(settings_file)
     logger.log_buddy_setup(config)
 
     return config
@@ -20,9 +20,7 @@ try:
 except:
     pass
 
-import ast
-import re
-
+from miniboss.auto_gpt_logs import find_task_complete_reason
 from miniboss.config import Config
 
 
@@ -220,43 +218,19 @@ def get_latest_markdown() -> str:
     return current_bulletin
 
 
-def parse_auto_gpt_logs(target_directory):
+def parse_auto_gpt_logs(target_directory, start_offset=0):
     """
     Parses the logs of the AutoGPT task.
 
     Args:
         target_directory (str): The path to the target directory.
+        start_offset (int): The byte offset in the log to search from, as returned
+            by get_log_offset() before the task was launched.
 
     Returns:
         str: The parsed reason for task completion.
     """
-    # Define the log file path
-    log_file_path = os.path.join(target_directory, "logs/activity.log")
-    # Read the log file in reverse
-    with open(log_file_path, "r", encoding="utf-8") as log_file:
-        lines = log_file.readlines()
-        lines.reverse()
-    # Define a regular expression pattern to match the "task_complete" command and its arguments
-    pattern = r"COMMAND = task_complete\s+ARGUMENTS = ({.*})"
-    # Search for the pattern in the reversed log content
-    reason = ""
-    for line in lines:
-        match = re.search(pattern, line)
-        if match:
-            arguments_str = match.group(1)
-            # Parse the string to a Python dictionary
-            arguments = ast.literal_eval(arguments_str)
-            # Access the 'reason' value
-            pre_reason = arguments["reason"]
-            # Remove single and double quotes
-            reason = pre_reason.strip("'\"").replace("'", "")
-            # Print the 'reason' value
-            # print(f"Task complete Reason: {reason}")
-            return reason
-    else:
-        # make this an error
-        # print("Task complete command not found in the log file.")
-        return reason
+    return find_task_complete_reason(target_directory, start_offset)
 
 
 def check_news_updates(cfg):